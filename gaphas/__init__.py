@@ -45,6 +45,12 @@ __version__ = "$Revision$"
 from .canvas import Canvas
 from .connector import Handle
 from .item import Item, Line, Element
-from .view import View, GtkView
+from .baseview import View
+
+try:
+    from .view import GtkView
+except ImportError:
+    # Without GTK+ only views that are not displayed can be used
+    pass
 
 # vi:sw=4:et:ai
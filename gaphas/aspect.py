@@ -12,7 +12,6 @@ from __future__ import absolute_import
 
 from builtins import object
 
-from gi.repository import Gdk
 from simplegeneric import generic
 
 from gaphas.item import Item, Element
@@ -75,6 +74,14 @@ class ItemInMotion(object):
     def start_move(self, pos):
         self.last_x, self.last_y = pos
 
+    def snap(self, pos):
+        """
+        Return the position the item should be moved to, if the pointer
+        is at ``pos``. Both are in view coordinates. By default the item
+        follows the pointer.
+        """
+        return pos
+
     def move(self, pos):
         """
         Move the item. x and y are in view coordinates.
@@ -83,7 +90,7 @@ class ItemInMotion(object):
         view = self.view
         v2i = view.get_matrix_v2i(item)
 
-        x, y = pos
+        x, y = self.snap(pos)
         dx, dy = x - self.last_x, y - self.last_y
         dx, dy = v2i.transform_distance(dx, dy)
         self.last_x, self.last_y = x, y
@@ -141,11 +148,14 @@ class ElementHandleSelection(ItemHandleSelection):
     def select(self):
         index = self.item.handles().index(self.handle)
         if index < 4:
+            from gi.repository import Gdk
+
             display = self.view.get_display()
             cursor = Gdk.Cursor.new_from_name(display, self.CURSORS[index])
             self.view.get_window().set_cursor(cursor)
 
     def unselect(self):
+        from gi.repository import Gdk
         from .view import DEFAULT_CURSOR
 
         cursor = Gdk.Cursor(DEFAULT_CURSOR)
@@ -164,11 +174,15 @@ class ItemHandleInMotion(object):
         self.handle = handle
         self.view = view
         self.last_x, self.last_y = None, None
+        self.glue_session = None
 
     def start_move(self, pos):
         self.last_x, self.last_y = pos
         canvas = self.item.canvas
 
+        if self.handle.connectable:
+            self.glue_session = self.view.glue_session()
+
         cinfo = canvas.get_connection(self.handle)
         if cinfo:
             canvas.solver.remove_constraint(cinfo.constraint)
@@ -193,7 +207,7 @@ class ItemHandleInMotion(object):
         return sink
 
     def stop_move(self):
-        pass
+        self.glue_session = None
 
     def glue(self, pos, distance=GLUE_DISTANCE):
         """
@@ -209,7 +223,7 @@ class ItemHandleInMotion(object):
             return None
 
         connectable, port, glue_pos = view.get_port_at_point(
-            pos, distance=distance, exclude=(item,)
+            pos, distance=distance, exclude=(item,), session=self.glue_session
         )
 
         # check if item and found item can be connected on closest port
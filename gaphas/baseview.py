@@ -0,0 +1,808 @@
+"""
+Views that are not displayed: the base ``View`` and the
+``OffscreenView``, used for rendering canvases without a window (see
+``gaphas.export``). This module does not depend on GTK+.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+
+from builtins import object
+from math import sqrt
+
+from cairo import Matrix
+from cairo import Context as CairoContext, ImageSurface, FORMAT_ARGB32
+
+from .canvas import Context
+from .geometry import Rectangle, distance_point_point_fast
+from .index import GlueSession, HandlePortIndex
+from .matrix import MatrixStore
+from .painter import DefaultPainter, BoundingBoxPainter, ItemPainter, PainterChain
+from .quadtree import Quadtree
+
+# Zooming only rescales the spatial index while the zoom factor since
+# the last full update is within this range.
+INDEX_SCALE_RANGE = (0.5, 2.0)
+
+
+class View(object):
+    """
+    View class for gaphas.Canvas objects.
+    """
+
+    def __init__(self, canvas=None):
+        self._matrix = Matrix()
+
+        # Translation and scale of the view since the item matrices and
+        # the spatial index were calculated. Bounding boxes and item
+        # matrices are stored without them ("index space") and they are
+        # applied lazily: view = index * scale + offset. This makes
+        # scrolling and zooming cheap, see scroll() and zoom().
+        self._offset = (0.0, 0.0)
+        self._index_scale = 1.0
+
+        self._painter = DefaultPainter(self)
+        self._bounding_box_painter = BoundingBoxPainter(self)
+
+        # Handling selections.
+        # TODO: Move this to a context?
+        self._selected_items = set()
+        self._focused_item = None
+        self._hovered_item = None
+        self._dropzone_item = None
+
+        self._qtree = Quadtree()
+        self._bounds = Rectangle(0, 0, 0, 0)
+
+        # Item to view matrices, in index space
+        self._item_matrices = MatrixStore()
+
+        # Rendered tiles, see gaphas.tiling. Disabled by default.
+        self._tile_cache = None
+
+        # Drawing of small items, see painter.LevelOfDetail. Disabled by
+        # default.
+        self._level_of_detail = None
+
+        # Cached hit testing, see gaphas.tiling. Disabled by default.
+        self._hit_test_cache = None
+
+        # Secondary indexes, see gaphas.index
+        self._handle_port_index = HandlePortIndex()
+        self._indexes = [self._handle_port_index]
+
+        self._canvas = None
+        if canvas:
+            self._set_canvas(canvas)
+
+    matrix = property(lambda s: s._matrix, doc="Canvas to view transformation matrix")
+
+    offset = property(
+        lambda s: s._offset, doc="Translation of the view, see ``scroll()``"
+    )
+
+    def _set_tile_cache(self, tile_cache):
+        """
+        Set the tile cache (a ``gaphas.tiling.TileCache``) used to paint
+        the items. Set to None to paint items directly.
+        """
+        if tile_cache is not None:
+            tile_cache.clear()
+        self._tile_cache = tile_cache
+        self.queue_draw_refresh()
+
+    tile_cache = property(lambda s: s._tile_cache, _set_tile_cache)
+
+    def _set_hit_test_cache(self, hit_test_cache):
+        """
+        Set the hit test cache (a ``gaphas.tiling.HitTestCache``) used to
+        find items at a point. Set to None to test items geometrically.
+        """
+        if hit_test_cache is not None:
+            hit_test_cache.clear()
+        self._hit_test_cache = hit_test_cache
+
+    hit_test_cache = property(lambda s: s._hit_test_cache, _set_hit_test_cache)
+
+    def _set_level_of_detail(self, level_of_detail):
+        """
+        Set the thresholds (a ``gaphas.painter.LevelOfDetail``) for
+        drawing small items simplified. Set to None to draw all items in
+        full detail.
+        """
+        self._level_of_detail = level_of_detail
+        if self._tile_cache is not None:
+            self._tile_cache.clear()
+        if self._hit_test_cache is not None:
+            self._hit_test_cache.clear()
+        self.queue_draw_refresh()
+
+    level_of_detail = property(lambda s: s._level_of_detail, _set_level_of_detail)
+
+    def _set_canvas(self, canvas):
+        """
+        Use view.canvas = my_canvas to set the canvas to be rendered
+        in the view.
+        """
+        if self._canvas:
+            self._qtree.clear()
+            self._clear_indexes()
+            self._clear_matrices()
+            self._selected_items.clear()
+            self._focused_item = None
+            self._hovered_item = None
+            self._dropzone_item = None
+            if self._tile_cache is not None:
+                self._tile_cache.clear()
+            if self._hit_test_cache is not None:
+                self._hit_test_cache.clear()
+
+        self._canvas = canvas
+
+    canvas = property(lambda s: s._canvas, _set_canvas)
+
+    def emit(self, *args, **kwargs):
+        """
+        Placeholder method for signal emission functionality.
+        """
+        pass
+
+    def queue_draw_item(self, *items):
+        """
+        Placeholder for item redraw queueing.
+        """
+        pass
+
+    def queue_draw_refresh(self):
+        """
+        Placeholder for redrawing the entire view.
+        """
+        pass
+
+    def request_update(self, items, matrix_only_items=(), removed_items=()):
+        """
+        Request update for items. The view forgets the removed items,
+        subclasses update the other items.
+        """
+        qtree = self._qtree
+        for item in removed_items:
+            if item in qtree:
+                qtree.remove(item)
+            self._remove_from_indexes(item)
+            self._item_matrices.discard(item)
+            self._selected_items.discard(item)
+
+        if removed_items:
+            if self.focused_item in removed_items:
+                self.focused_item = None
+            if self.hovered_item in removed_items:
+                self.hovered_item = None
+            if self.dropzone_item in removed_items:
+                self.dropzone_item = None
+
+    def select_item(self, item):
+        """
+        Select an item. This adds @item to the set of selected items.
+        """
+        self.queue_draw_item(item)
+        if item not in self._selected_items:
+            self._selected_items.add(item)
+            self.emit("selection-changed", self._selected_items)
+
+    def unselect_item(self, item):
+        """
+        Unselect an item.
+        """
+        self.queue_draw_item(item)
+        if item in self._selected_items:
+            self._selected_items.discard(item)
+            self.emit("selection-changed", self._selected_items)
+
+    def select_items(self, items):
+        """
+        Select a number of items at once. Unlike ``select_item()``,
+        "selection-changed" is emitted only once.
+        """
+        selected_items = self._selected_items
+        items = [item for item in items if item not in selected_items]
+        if items:
+            selected_items.update(items)
+            self.queue_draw_item(*items)
+            self.emit("selection-changed", selected_items)
+
+    def unselect_items(self, items):
+        """
+        Unselect a number of items at once. See ``select_items()``.
+        """
+        selected_items = self._selected_items
+        items = [item for item in items if item in selected_items]
+        if items:
+            selected_items.difference_update(items)
+            self.queue_draw_item(*items)
+            self.emit("selection-changed", selected_items)
+
+    def select_all(self):
+        self.select_items(self.canvas.get_all_items())
+
+    def unselect_all(self):
+        """
+        Clearing the selected_item also clears the focused_item.
+        """
+        self.queue_draw_item(*self._selected_items)
+        self._selected_items.clear()
+        self.focused_item = None
+        self.emit("selection-changed", self._selected_items)
+
+    selected_items = property(
+        lambda s: s._selected_items,
+        select_item,
+        unselect_all,
+        "Items selected by the view",
+    )
+
+    def _set_focused_item(self, item):
+        """
+        Set the focused item, this item is also added to the
+        selected_items set.
+        """
+        if not item is self._focused_item:
+            self.queue_draw_item(self._focused_item, item)
+
+        if item:
+            self.select_item(item)
+        if item is not self._focused_item:
+            self._focused_item = item
+            self.emit("focus-changed", item)
+
+    def _del_focused_item(self):
+        """
+        Items that loose focus remain selected.
+        """
+        self._set_focused_item(None)
+
+    focused_item = property(
+        lambda s: s._focused_item,
+        _set_focused_item,
+        _del_focused_item,
+        "The item with focus (receives key events a.o.)",
+    )
+
+    def _set_hovered_item(self, item):
+        """
+        Set the hovered item.
+        """
+        if item is not self._hovered_item:
+            self.queue_draw_item(self._hovered_item, item)
+            self._hovered_item = item
+            self.emit("hover-changed", item)
+
+    def _del_hovered_item(self):
+        """
+        Unset the hovered item.
+        """
+        self._set_hovered_item(None)
+
+    hovered_item = property(
+        lambda s: s._hovered_item,
+        _set_hovered_item,
+        _del_hovered_item,
+        "The item directly under the mouse pointer",
+    )
+
+    def _set_dropzone_item(self, item):
+        """
+        Set dropzone item.
+        """
+        if item is not self._dropzone_item:
+            self.queue_draw_item(self._dropzone_item, item)
+            self._dropzone_item = item
+            self.emit("dropzone-changed", item)
+
+    def _del_dropzone_item(self):
+        """
+        Unset dropzone item.
+        """
+        self._set_dropzone_item(None)
+
+    dropzone_item = property(
+        lambda s: s._dropzone_item,
+        _set_dropzone_item,
+        _del_dropzone_item,
+        "The item which can group other items",
+    )
+
+    def _set_painter(self, painter):
+        """
+        Set the painter to use. Painters should implement painter.Painter.
+        """
+        self._painter = painter
+        painter.set_view(self)
+        self.emit("painter-changed")
+
+    painter = property(lambda s: s._painter, _set_painter)
+
+    def _set_bounding_box_painter(self, painter):
+        """
+        Set the painter to use for bounding box calculations.
+        """
+        self._bounding_box_painter = painter
+        painter.set_view(self)
+        self.emit("painter-changed")
+
+    bounding_box_painter = property(
+        lambda s: s._bounding_box_painter, _set_bounding_box_painter
+    )
+
+    def get_item_at_point(self, pos, selected=True):
+        """
+        Return the topmost item located at ``pos`` (x, y).
+
+        Parameters:
+         - selected: if False returns first non-selected item
+        """
+        items = self._qtree.find_intersect(self._index_bounds((pos[0], pos[1], 1, 1)))
+
+        # With a hit test cache, the topmost item drawn at pos is looked
+        # up. Items it covers and items that do not support pixel hit
+        # testing are tested geometrically.
+        hit_test = self._hit_test_cache
+        hit = None
+        if hit_test is not None:
+            hit = hit_test.item_at(self, pos)
+            if hit not in items:
+                hit = None
+            if all(item.pixel_hit_test for item in items):
+                if hit is None or selected or hit not in self.selected_items:
+                    return hit
+        below_hit = False
+
+        for item in self._canvas.sort(items, reverse=True):
+            if hit_test is not None and item.pixel_hit_test and not below_hit:
+                if item is not hit:
+                    continue  # not drawn at pos
+                below_hit = True
+
+            if not selected and item in self.selected_items:
+                continue  # skip selected items
+
+            if item is hit:
+                return item
+
+            v2i = self.get_matrix_v2i(item)
+            ix, iy = v2i.transform_point(*pos)
+            item_distance = item.point((ix, iy))
+            if item_distance is None:
+                print("Item distance is None for {}".format(item))
+                continue
+            if item_distance < 0.5:
+                return item
+        return None
+
+    def get_handle_at_point(self, pos, distance=6):
+        """
+        Look for a handle at ``pos`` and return the
+        tuple (item, handle).
+        """
+
+        def find(item):
+            """ Find item's handle at pos """
+            v2i = self.get_matrix_v2i(item)
+            d = distance_point_point_fast(v2i.transform_distance(0, distance))
+            x, y = v2i.transform_point(*pos)
+
+            for h in item.handles():
+                if not h.movable:
+                    continue
+                hx, hy = h.pos
+                if -d < (hx - x) < d and -d < (hy - y) < d:
+                    return h
+
+        # The focused item is the preferred item for handle grabbing
+        if self.focused_item:
+            h = find(self.focused_item)
+            if h:
+                return self.focused_item, h
+
+        # then try hovered item
+        if self.hovered_item:
+            h = find(self.hovered_item)
+            if h:
+                return self.hovered_item, h
+
+        # Last try the topmost item with a handle near pos. The square
+        # find() checks is in item coordinates, so it may be rotated
+        v2c = Matrix(*self._matrix)
+        v2c.invert()
+        x, y = v2c.transform_point(*pos)
+        d = 2 * distance_point_point_fast(v2c.transform_distance(0, distance))
+        handles = self._handle_port_index.find_handles_in_rectangle(
+            (x - d, y - d, 2 * d, 2 * d)
+        )
+        items = set(item for item, h in handles)
+        for item in self._canvas.sort(items, reverse=True):
+            h = find(item)
+            if h:
+                return item, h
+        return None, None
+
+    def get_port_at_point(self, vpos, distance=10, exclude=None, session=None):
+        """
+        Find item with port closest to specified position.
+
+        List of items to be ignored can be specified with `exclude`
+        parameter. During a handle drag, the ports can be looked up
+        through a `GlueSession` (see `glue_session()`).
+
+        Tuple is returned
+
+        - found item
+        - closest, connectable port
+        - closest point on found port (in view coordinates)
+
+        :Parameters:
+         vpos
+            Position specified in view coordinates.
+         distance
+            Max distance from point to a port (default 10)
+         exclude
+            Set of items to ignore.
+         session
+            Glue session to look up ports in.
+        """
+        exclude = exclude or ()
+        point, max_distance = self._to_canvas(vpos, distance)
+        accept = lambda i, p: p.connectable and i not in exclude
+        if session:
+            found = session.find_port(point, max_distance, accept)
+        else:
+            found = self._handle_port_index.find_ports(
+                point, max_distance=max_distance, accept=accept
+            )
+            found = found and found[0]
+        if not found:
+            return None, None, None
+
+        item, port, glue_point, d = found
+        # transform coordinates from canvas space to view space
+        glue_pos = self._matrix.transform_point(*glue_point)
+        return item, port, glue_pos
+
+    def glue_session(self, margin=100):
+        """
+        Create a `GlueSession` for ``get_port_at_point()``, to be used
+        while a handle is dragged. ``margin`` is in view coordinates.
+        """
+        point, margin = self._to_canvas((0, 0), margin)
+        return GlueSession(self._handle_port_index, margin)
+
+    def _to_canvas(self, pos, distance):
+        """
+        Convert a position and distance in view coordinates to canvas
+        coordinates.
+        """
+        v2c = Matrix(*self._matrix)
+        v2c.invert()
+        xx, yx, xy, yy, x0, y0 = self._matrix
+        return v2c.transform_point(*pos), distance / sqrt(abs(xx * yy - xy * yx))
+
+    def get_items_in_rectangle(self, rect, intersect=True, reverse=False):
+        """
+        Return the items in the rectangle 'rect'.
+        Items are automatically sorted in canvas' processing order.
+        """
+        rect = self._index_bounds(rect)
+        if intersect:
+            items = self._qtree.find_intersect(rect)
+        else:
+            items = self._qtree.find_inside(rect)
+        return self._canvas.sort(items, reverse=reverse)
+
+    def get_items_in_rectangles(self, rects, intersect=True, reverse=False):
+        """
+        Return the items for each rectangle in ``rects``, as a list of
+        item lists. The spatial index is traversed only once.
+        Items are automatically sorted in canvas' processing order.
+        """
+        rects = [self._index_bounds(rect) for rect in rects]
+        if intersect:
+            found = self._qtree.find_intersect_many(rects)
+        else:
+            found = self._qtree.find_inside_many(rects)
+        sort = self._canvas.sort
+        return [sort(items, reverse=reverse) for items in found]
+
+    def select_in_rectangle(self, rect):
+        """
+        Select all items who have their bounding box within the
+        rectangle @rect.
+        """
+        self.select_items(self._qtree.find_inside(self._index_bounds(rect)))
+
+    def zoom(self, factor):
+        """
+        Zoom in/out by factor @factor.
+
+        The bounding boxes in the spatial index are scaled along with
+        the view. Only when the view is zoomed too far from the last
+        update, all items are updated.
+        """
+        # TODO: should the scale factor be clipped?
+        # The view is scaled around the canvas origin
+        x0, y0 = self._matrix.transform_point(0, 0)
+        self._matrix.scale(factor, factor)
+
+        ox, oy = self._offset
+        self._offset = (
+            factor * ox + (1 - factor) * x0,
+            factor * oy + (1 - factor) * y0,
+        )
+        self._index_scale *= factor
+
+        low, high = INDEX_SCALE_RANGE
+        if not low <= self._index_scale <= high:
+            self._reset_index_scale()
+            # Make sure everything's updated
+            self.request_update((), self._canvas.get_all_items())
+
+    def _reset_index_scale(self):
+        """
+        Bring the spatial index back to the scale of the view. The
+        bounding boxes in the index are scaled right away, so queries
+        remain valid until the items are updated.
+        """
+        scale = self._index_scale
+        qtree = self._qtree
+        entries = [
+            (item, qtree.get_bounds(item), qtree.get_data(item))
+            for item in self._canvas.get_all_items()
+            if item in qtree
+        ]
+        x, y, w, h = qtree.bounds
+        qtree.clear()
+        qtree.resize((x * scale, y * scale, w * scale, h * scale))
+        for item, (x, y, w, h), data in entries:
+            qtree.add(item, (x * scale, y * scale, w * scale, h * scale), data)
+
+        self._index_scale = 1.0
+        self._clear_matrices()
+
+    def scroll(self, dx, dy):
+        """
+        Scroll the view by (``dx``, ``dy``), in view coordinates.
+
+        Only the view matrix changes. Item matrices and bounding boxes do
+        not need to be updated.
+        """
+        # Can not use self._matrix.translate() here, since that would
+        # translate in canvas coordinates
+        self._matrix = self._matrix.multiply(Matrix(1, 0, 0, 1, dx, dy))
+        ox, oy = self._offset
+        self._offset = (ox + dx, oy + dy)
+
+    def _index_bounds(self, bounds):
+        """
+        Convert ``bounds`` from view coordinates to the coordinates used
+        in the spatial index.
+        """
+        ox, oy = self._offset
+        scale = self._index_scale
+        if scale != 1.0:
+            x, y, w, h = bounds
+            return Rectangle((x - ox) / scale, (y - oy) / scale, w / scale, h / scale)
+        if not (ox or oy):
+            return bounds
+        x, y, w, h = bounds
+        return Rectangle(x - ox, y - oy, w, h)
+
+    def _view_bounds(self, bounds):
+        """
+        Convert ``bounds`` from the coordinates used in the spatial index
+        to view coordinates.
+        """
+        ox, oy = self._offset
+        scale = self._index_scale
+        if scale != 1.0:
+            x, y, w, h = bounds
+            bounds = Rectangle(x * scale + ox, y * scale + oy, w * scale, h * scale)
+            return bounds
+        if not (ox or oy):
+            return bounds
+        x, y, w, h = bounds
+        return Rectangle(x + ox, y + oy, w, h)
+
+    def _index_matrix(self):
+        """
+        Return the index to view transformation matrix.
+        """
+        ox, oy = self._offset
+        scale = self._index_scale
+        return Matrix(scale, 0, 0, scale, ox, oy)
+
+    def set_item_bounding_box(self, item, bounds):
+        """
+        Update the bounding box of the item.
+
+        ``bounds`` is in view coordinates.
+
+        Coordinates are calculated back to item coordinates, so
+        matrix-only updates can occur.
+        """
+        v2i = self.get_matrix_v2i(item).transform_point
+        ix0, iy0 = v2i(bounds.x, bounds.y)
+        ix1, iy1 = v2i(bounds.x1, bounds.y1)
+        self._qtree.add(
+            item=item, bounds=self._index_bounds(bounds), data=(ix0, iy0, ix1, iy1)
+        )
+        self._update_indexes(item)
+
+    def get_item_bounding_box(self, item):
+        """
+        Get the bounding box for the item, in view coordinates.
+        """
+        return self._view_bounds(self._qtree.get_bounds(item))
+
+    bounding_box = property(lambda s: s._view_bounds(s._bounds))
+
+    def register_index(self, index):
+        """
+        Register a secondary index (see ``gaphas.index``). The index is
+        kept up to date for all items that have a bounding box in this
+        view.
+        """
+        self._indexes.append(index)
+        if self._canvas:
+            for item in self._canvas.get_all_items():
+                if item in self._qtree:
+                    index.update_item(self, item)
+
+    def unregister_index(self, index):
+        """
+        Unregister a secondary index.
+        """
+        self._indexes.remove(index)
+
+    def _update_indexes(self, item, matrix_only=False):
+        for index in self._indexes:
+            index.update_item(self, item, matrix_only)
+
+    def _remove_from_indexes(self, item):
+        for index in self._indexes:
+            index.remove_item(item)
+
+    def _clear_indexes(self):
+        for index in self._indexes:
+            index.clear()
+
+    def update_bounding_box(self, cr, items=None):
+        """
+        Update the bounding boxes of the canvas items for this view,
+        in canvas coordinates.
+        """
+        painter = self._bounding_box_painter
+        if items is None:
+            items = self.canvas.get_all_items()
+
+        # The painter calls set_item_bounding_box() for each rendered item.
+        painter.paint(Context(cairo=cr, items=items, area=None))
+
+        # Update the view's bounding box with the rest of the items
+        self._bounds = Rectangle(*self._qtree.soft_bounds)
+
+    def paint(self, cr):
+        self._painter.paint(
+            Context(cairo=cr, items=self.canvas.get_all_items(), area=None)
+        )
+
+    def get_matrix_i2v(self, item):
+        """
+        Get Item to View matrix for ``item``.
+        """
+        if item not in self._item_matrices:
+            self.update_matrix(item)
+        i2v = self._item_matrices.get(item)
+        ox, oy = self._offset
+        if ox or oy or self._index_scale != 1.0:
+            i2v = i2v.multiply(self._index_matrix())
+        return i2v
+
+    def get_matrix_v2i(self, item):
+        """
+        Get View to Item matrix for ``item``.
+        """
+        if item not in self._item_matrices:
+            self.update_matrix(item)
+        v2i = self._item_matrices.get_inverse(item)
+        ox, oy = self._offset
+        if ox or oy or self._index_scale != 1.0:
+            v2index = self._index_matrix()
+            v2index.invert()
+            v2i = v2index.multiply(v2i)
+        return v2i
+
+    def update_matrix(self, item):
+        """
+        Update item matrices related to view.
+        """
+        matrix_i2c = self.canvas.get_matrix_i2c(item)
+        try:
+            i2v = matrix_i2c.multiply(self._matrix)
+        except AttributeError:
+            # Fall back to old behaviour
+            i2v = matrix_i2c * self._matrix
+
+        ox, oy = self._offset
+        if ox or oy or self._index_scale != 1.0:
+            v2index = self._index_matrix()
+            v2index.invert()
+            i2v = i2v.multiply(v2index)
+
+        self._item_matrices.set(item, i2v)
+
+    def _clear_matrices(self):
+        """
+        Clear the item matrices of this view.
+        """
+        self._item_matrices.clear()
+
+
+class OffscreenView(View):
+    """
+    A view that is not displayed, for rendering a canvas to a cairo
+    surface without a window (see ``gaphas.export``). Only the items are
+    painted: no handles or tool feedback.
+
+    The view does not register itself on the canvas. Call ``update()``
+    after the canvas has changed.
+    """
+
+    def __init__(self, canvas=None):
+        super(OffscreenView, self).__init__(canvas)
+        self._painter = PainterChain(self).append(ItemPainter())
+
+    def _set_canvas(self, canvas):
+        """
+        Use view.canvas = my_canvas to set the canvas to be rendered
+        in the view. The items are updated right away.
+        """
+        super(OffscreenView, self)._set_canvas(canvas)
+        if self._canvas:
+            self.update()
+
+    canvas = property(lambda s: s._canvas, _set_canvas)
+
+    def request_update(self, items, matrix_only_items=(), removed_items=()):
+        """
+        Update the items. All items are updated right away.
+        """
+        super(OffscreenView, self).request_update(
+            items, matrix_only_items, removed_items
+        )
+        self.update()
+
+    def update(self):
+        """
+        Update the matrices and bounding boxes of all items.
+        """
+        canvas = self._canvas
+        if canvas.require_update():
+            canvas.update_now()
+
+        self._qtree.clear()
+        self._clear_indexes()
+        self._clear_matrices()
+        if self._tile_cache is not None:
+            self._tile_cache.clear()
+        if self._hit_test_cache is not None:
+            self._hit_test_cache.clear()
+
+        items = canvas.get_all_items()
+        for item in items:
+            self.update_matrix(item)
+
+        # An empty surface will do for calculating bounding boxes
+        cr = CairoContext(ImageSurface(FORMAT_ARGB32, 0, 0))
+        self.update_bounding_box(cr, items)
+
+        # There is no visible area to fit the spatial index to: it
+        # should cover all items.
+        self._qtree.resize(self._bounds)
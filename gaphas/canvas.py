@@ -593,6 +593,40 @@ class Canvas(object):
         """
         self.request_update(item, update=False, matrix=True)
 
+    @observed
+    def move_items(self, items, dx, dy):
+        """
+        Move ``items`` by (``dx``, ``dy``), in canvas coordinates.
+
+        The items are moved in one go: one (reversible) event is emitted
+        and the matrices of all items are scheduled for update at once.
+        Children move along with their parent, so only pass items whose
+        parents are not moved as well.
+
+        >>> c = Canvas()
+        >>> from gaphas import item
+        >>> i1, i2 = item.Item(), item.Item()
+        >>> i2.matrix.scale(2, 2)
+        >>> c.add(i1)
+        >>> c.add(i2)
+        >>> c.move_items((i1, i2), 10, 5)
+        >>> c.update_now()
+        >>> tuple(c.get_matrix_i2c(i1)), tuple(c.get_matrix_i2c(i2))
+        ((1.0, 0.0, 0.0, 1.0, 10.0, 5.0), (2.0, 0.0, 0.0, 2.0, 10.0, 5.0))
+        """
+        for item in items:
+            tx, ty = self.get_matrix_c2i(item).transform_distance(dx, dy)
+            # Do not emit an event per item
+            item.matrix._matrix.translate(tx, ty)
+        self._dirty_matrix_items.update(items)
+        self.update()
+
+    reversible_method(
+        move_items,
+        reverse=move_items,
+        bind={"dx": lambda dx: -dx, "dy": lambda dy: -dy},
+    )
+
     def require_update(self):
         """
         Returns ``True`` or ``False`` depending on if an update is
@@ -714,6 +748,10 @@ class Canvas(object):
             len(self._dirty_items) == 0 and len(self._dirty_matrix_items) == 0
         ), "dirty: %s; matrix: %s" % (self._dirty_items, self._dirty_matrix_items)
 
+        # drawings of the items, cached by painters, are no longer valid
+        for item in dirty_items:
+            item._update_generation += 1
+
         self._update_views(dirty_items, dirty_matrix_items)
 
     def update_matrices(self, items):
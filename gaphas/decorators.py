@@ -6,10 +6,14 @@ from __future__ import print_function
 import threading
 from builtins import object
 
-import gi
+try:
+    import gi
 
-gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk, GLib
+    gi.require_version("Gtk", "3.0")
+    from gi.repository import Gtk, GLib
+except ImportError:
+    # Without GTK+, as when exporting, functions are executed directly
+    GLib = None
 
 DEBUG_ASYNC = False
 
@@ -97,7 +101,7 @@ class AsyncIO(object):
     it's only executed once.
     """
 
-    def __init__(self, single=False, timeout=0, priority=GLib.PRIORITY_DEFAULT):
+    def __init__(self, single=False, timeout=0, priority=None):
         self.single = single
         self.timeout = timeout
         self.priority = priority
@@ -109,7 +113,8 @@ class AsyncIO(object):
         else:
             s = GLib.Idle()
         s.set_callback(func)
-        s.priority = self.priority
+        priority = self.priority
+        s.priority = GLib.PRIORITY_DEFAULT if priority is None else priority
         return s
 
     def __call__(self, func):
@@ -119,7 +124,7 @@ class AsyncIO(object):
         def wrapper(*args, **kwargs):
             global getattr, setattr, delattr
             # execute directly if we're not in the main loop.
-            if GLib.main_depth() == 0:
+            if GLib is None or GLib.main_depth() == 0:
                 return func(*args, **kwargs)
             elif not self.single:
 
@@ -17,6 +17,8 @@ class Box(Element):
      SW +---+ SE
     """
 
+    bounds_from_handles = True
+
     def __init__(self, width=10, height=10):
         super(Box, self).__init__(width, height)
 
@@ -53,6 +55,9 @@ class PortoBox(Box):
                 x
     """
 
+    # The movable port is drawn outside of the box
+    bounds_from_handles = False
+
     def __init__(self, width=10, height=10):
         super(PortoBox, self).__init__(width, height)
 
@@ -0,0 +1,305 @@
+"""
+Render canvases to images and documents, without a window.
+
+A canvas is rendered through an ``OffscreenView``:
+
+>>> from gaphas.canvas import Canvas
+>>> from gaphas.examples import Box
+>>> canvas = Canvas()
+>>> canvas.add(Box(40, 20))
+>>> view = OffscreenView(canvas)
+>>> view.bounding_box
+Rectangle(-6, -6, 51, 31)
+
+``export()`` renders a canvas to a PNG, SVG or PDF file.
+``export_batch()`` exports many canvases in parallel worker processes.
+``render_tiles()`` renders large images in tiles, on several threads.
+
+Large canvases can be split up: ``export_pages()`` renders a canvas to
+a multi-page PDF, ``export_tiles()`` renders a pyramid of PNG tiles, as
+used by web map viewers. Only one page or tile is kept in memory at a
+time.
+"""
+from __future__ import absolute_import
+from __future__ import division
+
+import os
+from builtins import range
+from builtins import zip
+from collections import deque
+from math import ceil, log
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+
+import cairo
+
+from . import picklers  # canvases are sent to worker processes
+from .canvas import Context
+from .geometry import Rectangle
+from .painter import ItemPainter
+from .baseview import OffscreenView
+
+
+def render(view, surface, area=None):
+    """
+    Render the items of ``view`` in ``area`` (x, y, width, height, in
+    view coordinates) to the cairo surface ``surface``. The top-left
+    corner of the area is drawn at the origin of the surface. By
+    default the bounding box of the view is rendered.
+    """
+    if area is None:
+        area = view.bounding_box
+    _render(view, view.painter, surface, Rectangle(*area))
+
+
+def _render(view, painter, surface, area, items=None):
+    offset = surface.get_device_offset()
+    surface.set_device_offset(-area.x, -area.y)
+    try:
+        cr = cairo.Context(surface)
+        cr.rectangle(*area)
+        cr.clip()
+        if items is None:
+            items = view.get_items_in_rectangle(area)
+        painter.paint(Context(cairo=cr, items=items, area=area))
+        surface.flush()
+    finally:
+        surface.set_device_offset(*offset)
+
+
+def render_tiles(view, surface, area=None, tile_size=512, threads=None):
+    """
+    Like ``render()``, but ``area`` is split in tiles of ``tile_size``
+    pixels. The tiles are rendered on ``threads`` threads (by default
+    one per CPU) and painted on ``surface`` as they are finished. Cairo
+    releases the GIL while rasterizing, so the threads do run in
+    parallel.
+
+    Only the items are painted, each thread with its own
+    ``ItemPainter``. The items of all tiles are looked up before the
+    threads are started, so the threads do not query the spatial index
+    of the view. The canvas and the view must not change during the
+    render.
+    """
+    if area is None:
+        area = view.bounding_box
+    area = Rectangle(*area)
+
+    def render_tile(job):
+        tile, items = job
+        width = min(tile.width, area.x1 - tile.x)
+        height = min(tile.height, area.y1 - tile.y)
+        tile = Rectangle(tile.x, tile.y, width, height)
+        tile_surface = cairo.ImageSurface(
+            cairo.FORMAT_ARGB32, int(ceil(width)), int(ceil(height))
+        )
+        _render(view, ItemPainter(view), tile_surface, tile, items)
+        return tile, tile_surface
+
+    tiles = [tile for column, row, tile in _split(area, tile_size, tile_size)]
+    jobs = [
+        (tile, items)
+        for tile, items in zip(tiles, view.get_items_in_rectangles(tiles))
+        if items
+    ]
+
+    offset = surface.get_device_offset()
+    surface.set_device_offset(-area.x, -area.y)
+    pool = ThreadPool(threads or cpu_count())
+    try:
+        cr = cairo.Context(surface)
+        for tile, tile_surface in pool.imap_unordered(render_tile, jobs):
+            cr.set_source_surface(tile_surface, tile.x, tile.y)
+            cr.paint()
+        surface.flush()
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        surface.set_device_offset(*offset)
+
+
+def export(canvas, filename, format=None, area=None, scale=1.0, padding=0, threads=1):
+    """
+    Export ``canvas`` to ``filename``. The format ("png", "svg" or
+    "pdf") is derived from the file name extension, unless ``format``
+    is provided.
+
+    By default the whole canvas is exported. ``area`` (x, y, width,
+    height) is in canvas coordinates. The canvas is scaled by
+    ``scale``, and ``padding`` pixels are added on every side.
+
+    PNG images are rendered in tiles on ``threads`` threads (None for
+    one per CPU), see ``render_tiles()``.
+
+    Returns the file name.
+    """
+    if not format:
+        format = os.path.splitext(filename)[1].lstrip(".")
+    format = format.lower()
+
+    view = _view(canvas, scale)
+
+    if area is None:
+        area = Rectangle(*view.bounding_box)
+    else:
+        x, y, w, h = area
+        area = Rectangle(x * scale, y * scale, w * scale, h * scale)
+    area.expand(padding)
+    width, height = max(1, int(ceil(area.width))), max(1, int(ceil(area.height)))
+
+    if format == "png":
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        if threads == 1:
+            render(view, surface, area)
+        else:
+            render_tiles(view, surface, area, threads=threads)
+        surface.write_to_png(filename)
+    elif format == "svg":
+        surface = cairo.SVGSurface(filename, width, height)
+        render(view, surface, area)
+        surface.finish()
+    elif format == "pdf":
+        surface = cairo.PDFSurface(filename, width, height)
+        render(view, surface, area)
+        surface.finish()
+    else:
+        raise ValueError("Unsupported export format: %s" % format)
+    return filename
+
+
+def _view(canvas, scale):
+    view = OffscreenView()
+    view.matrix.scale(scale, scale)
+    view.canvas = canvas
+    return view
+
+
+def _split(bounds, width, height):
+    """
+    Split ``bounds`` in areas of ``width`` by ``height``. Iterates
+    (column, row, area) tuples, row by row.
+
+    >>> [(c, r, tuple(a)) for c, r, a in _split((10, 10, 150, 50), 100, 100)]
+    [(0, 0, (10, 10, 100, 100)), (1, 0, (110, 10, 100, 100))]
+    """
+    x, y, w, h = bounds
+    columns = max(1, int(ceil(w / width)))
+    rows = max(1, int(ceil(h / height)))
+    for row in range(rows):
+        for column in range(columns):
+            area = Rectangle(x + column * width, y + row * height, width, height)
+            yield column, row, area
+
+
+def export_pages(
+    canvas, filename, page_size=(595, 842), scale=1.0, padding=0, skip_empty=False
+):
+    """
+    Export ``canvas`` to a PDF file, split up in pages of ``page_size``
+    (width, height, in points; A4 by default). Pages are ordered row by
+    row. If ``skip_empty`` is True, pages without items are left out.
+
+    Returns the number of pages.
+    """
+    view = _view(canvas, scale)
+    bounds = Rectangle(*view.bounding_box)
+    bounds.expand(padding)
+    width, height = page_size
+
+    surface = cairo.PDFSurface(filename, width, height)
+    pages = 0
+    for column, row, area in _split(bounds, width, height):
+        if skip_empty and not view.get_items_in_rectangle(area):
+            continue
+        render(view, surface, area)
+        surface.show_page()
+        pages += 1
+    surface.finish()
+    return pages
+
+
+def export_tiles(canvas, directory, tile_size=256, levels=None, scale=1.0):
+    """
+    Export ``canvas`` as a pyramid of PNG tiles. The tiles are written
+    to ``directory``, as ``{level}/{column}/{row}.png``. The highest
+    level is rendered at ``scale``, every level below at half the scale
+    of the level above it. By default there are as many levels as
+    needed to fit the canvas in one tile at level 0. Tiles without
+    items are not written.
+
+    Returns the number of levels.
+    """
+    top = _view(canvas, scale)
+    x, y, w, h = top.bounding_box
+    if levels is None:
+        levels = max(0, int(ceil(log(max(w, h, 1) / tile_size, 2)))) + 1
+
+    # Tiles of all levels start at the same canvas position, so a tile
+    # covers the same part of the canvas as the four tiles below it. The
+    # bounding boxes of the views have a padding of a few pixels (for the
+    # handles), that is not scaled with the view.
+    x0, y0 = x / scale, y / scale
+
+    for level in range(levels):
+        level_scale = scale / 2 ** (levels - 1 - level)
+        view = top if level == levels - 1 else _view(canvas, level_scale)
+        bounds = view.bounding_box
+        bounds = Rectangle(
+            x0 * level_scale, y0 * level_scale, x1=bounds.x1, y1=bounds.y1
+        )
+        for column, row, area in _split(bounds, tile_size, tile_size):
+            if not view.get_items_in_rectangle(area):
+                continue
+            path = os.path.join(directory, str(level), str(column))
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, tile_size, tile_size)
+            render(view, surface, area)
+            surface.write_to_png(os.path.join(path, "%d.png" % row))
+    return levels
+
+
+def _export_job(canvas, filename, kwargs):
+    if callable(canvas):
+        canvas = canvas()
+    return export(canvas, filename, **kwargs)
+
+
+def export_batch(jobs, processes=None, maxtasksperchild=100, **kwargs):
+    """
+    Export canvases in parallel, in ``processes`` worker processes (by
+    default one per CPU). ``jobs`` is an iterable of (canvas, filename)
+    tuples. Instead of a canvas, a (picklable) callable can be passed,
+    that loads the canvas in the worker process. Keyword arguments are
+    passed on to ``export()``.
+
+    Jobs are taken from ``jobs`` as workers become available, so only a
+    few canvases are in memory at a time. Workers are replaced after
+    ``maxtasksperchild`` jobs.
+
+    Returns the list of exported file names, in order.
+    """
+    processes = processes or cpu_count()
+    pool = Pool(processes, maxtasksperchild=maxtasksperchild)
+    try:
+        pending = deque()
+        filenames = []
+        for canvas, filename in jobs:
+            if len(pending) >= 2 * processes:
+                filenames.append(pending.popleft().get())
+            pending.append(pool.apply_async(_export_job, (canvas, filename, kwargs)))
+        while pending:
+            filenames.append(pending.popleft().get())
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return filenames
+
+
+# vim:sw=4:et:ai
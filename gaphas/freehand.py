@@ -15,7 +15,9 @@ from __future__ import absolute_import
 from builtins import object
 from math import sqrt
 from random import Random
-from .painter import Context
+from weakref import WeakKeyDictionary
+
+from .painter import Context, ItemPainter
 
 
 class FreeHandCairoContext(object):
@@ -36,13 +38,48 @@ class FreeHandCairoContext(object):
         self.cr = cr
         self.sloppiness = sloppiness  # In range 0.0 .. 2.0
 
+        # Curves calculated before, see set_curves()
+        self._curves = None
+        self._curve_index = 0
+
     def __getattr__(self, key):
         return getattr(self.cr, key)
 
+    def set_curves(self, curves):
+        """
+        Use the list ``curves`` to store the calculated curves, as
+        ((segment), (control points)) tuples, in drawing order. Curves
+        in the list are reused when the same segments are drawn again.
+        Set to None to calculate all curves.
+        """
+        self._curves = curves
+        self._curve_index = 0
+
+    def _curve(self, segment, calculate):
+        """
+        Return the control points for ``segment``. ``calculate(*segment)``
+        is only called if the curve was not calculated before.
+        """
+        curves = self._curves
+        if curves is None:
+            return calculate(*segment)
+        i = self._curve_index
+        self._curve_index = i + 1
+        if i < len(curves) and curves[i][0] == segment:
+            return curves[i][1]
+        curve = calculate(*segment)
+        del curves[i:]
+        curves.append((segment, curve))
+        return curve
+
     def line_to(self, x, y):
         cr = self.cr
-        sloppiness = self.sloppiness
         from_x, from_y = cr.get_current_point()
+        cr.curve_to(*self._curve((from_x, from_y, x, y), self._sloppy_line))
+
+    def _sloppy_line(self, from_x, from_y, x, y):
+        cr = self.cr
+        sloppiness = self.sloppiness
 
         # calculate the length of the line.
         length = sqrt((x - from_x) * (x - from_x) + (y - from_y) * (y - from_y))
@@ -54,7 +91,8 @@ class FreeHandCairoContext(object):
             offset = 20
 
         dev_x, dev_y = cr.user_to_device(x, y)
-        rand = Random((from_x, from_y, dev_x, dev_y, length, offset)).random
+        seed = (from_x, from_y, dev_x, dev_y, length, offset)
+        rand = Random(hash(seed)).random
 
         # Overshoot the destination a little, as one might if drawing with a pen.
         to_x = x + sloppiness * rand() * offset / 4
@@ -85,8 +123,7 @@ class FreeHandCairoContext(object):
         control2_x = t1_x + r * (t2_x - t1_x)
         control2_y = t1_y + r * (t2_y - t1_y)
 
-        # draw the line!
-        cr.curve_to(control1_x, control1_y, control2_x, control2_y, to_x, to_y)
+        return control1_x, control1_y, control2_x, control2_y, to_x, to_y
 
     def rel_line_to(self, dx, dy):
         cr = self.cr
@@ -96,9 +133,13 @@ class FreeHandCairoContext(object):
     def curve_to(self, x1, y1, x2, y2, x3, y3):
         cr = self.cr
         from_x, from_y = cr.get_current_point()
+        segment = (from_x, from_y, x1, y1, x2, y2, x3, y3)
+        cr.curve_to(*self._curve(segment, self._sloppy_curve))
 
-        dev_x, dev_y = cr.user_to_device(x3, y3)
-        rand = Random((from_x, from_y, dev_x, dev_y, x1, y1, x2, y2, x3, y3)).random
+    def _sloppy_curve(self, from_x, from_y, x1, y1, x2, y2, x3, y3):
+        dev_x, dev_y = self.cr.user_to_device(x3, y3)
+        seed = (from_x, from_y, dev_x, dev_y, x1, y1, x2, y2, x3, y3)
+        rand = Random(hash(seed)).random
 
         r = rand()
         c1_x = from_x + r * (x1 - from_x)
@@ -108,7 +149,7 @@ class FreeHandCairoContext(object):
         c2_x = x3 + r * (x2 - x3)
         c2_y = y3 + r * (y2 - y3)
 
-        cr.curve_to(c1_x, c1_y, c2_x, c2_y, x3, y3)
+        return c1_x, c1_y, c2_x, c2_y, x3, y3
 
     def rel_curve_to(self, dx1, dy1, dx2, dy2, dx3, dy3):
         cr = self.cr
@@ -160,22 +201,52 @@ class FreeHandCairoContext(object):
 
 
 class FreeHandPainter(object):
+    """
+    Paint items with ``subpainter`` (an item painter), in a sketchy
+    style.
+
+    If ``subpainter`` is an ``ItemPainter``, items are painted one by
+    one. The sloppy curves are calculated once for every item and reused
+    until the item draws different segments, or the sloppiness changes.
+    Unlike freshly calculated curves, that are seeded from device
+    coordinates, the reused curves do not change when the view is
+    zoomed or scrolled.
+
+    Other painters (e.g. a ``PainterChain`` that also draws handles) are
+    called once for all items, and the curves are calculated every time.
+    """
+
     def __init__(self, subpainter, sloppiness=1.0, view=None):
         self.subpainter = subpainter
         self.view = view
         self.sloppiness = sloppiness
+        # item -> (sloppiness, curves)
+        self._curves = WeakKeyDictionary()
 
     def set_view(self, view):
         self.view = view
         self.subpainter.set_view(view)
+        self._curves.clear()
 
     def paint(self, context):
-        subcontext = Context(
-            cairo=FreeHandCairoContext(context.cairo, self.sloppiness),
-            items=context.items,
-            area=context.area,
-        )
-        self.subpainter.paint(subcontext)
+        sloppiness = self.sloppiness
+        cairo = FreeHandCairoContext(context.cairo, sloppiness)
+        paint = self.subpainter.paint
+        area = context.area
+        if not isinstance(self.subpainter, ItemPainter):
+            paint(Context(cairo=cairo, items=context.items, area=area))
+            return
+
+        for item in context.items:
+            try:
+                curves_sloppiness, curves = self._curves[item]
+            except KeyError:
+                curves_sloppiness = None
+            if curves_sloppiness != sloppiness:
+                curves = []
+                self._curves[item] = sloppiness, curves
+            cairo.set_curves(curves)
+            paint(Context(cairo=cairo, items=(item,), area=area))
 
 
 # vi:sw=4:et:ai
@@ -10,8 +10,19 @@ A point is represented as a tuple `(x, y)`.
 from __future__ import division
 
 from builtins import object
+from builtins import range
 from math import sqrt
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Polylines with more points than this are packed in NumPy arrays (if
+# available) by pack_points(), so their distance to a point is
+# calculated for all segments at once.
+NUMPY_POLYLINE_THRESHOLD = 32
+
 
 class Rectangle(object):
     """
@@ -440,6 +451,76 @@ def distance_line_point(line_start, line_end, point):
         )
 
 
+def pack_points(points):
+    """
+    Pack ``points`` (a sequence of (x, y) pairs) for
+    ``distance_polyline_point()``. Long polylines are packed in a NumPy
+    array, short ones in a list of (x, y) tuples of floats.
+
+    >>> pack_points([(0, 0), (10, 0)])
+    [(0.0, 0.0), (10.0, 0.0)]
+    """
+    points = [(float(x), float(y)) for x, y in points]
+    if numpy is not None and len(points) > NUMPY_POLYLINE_THRESHOLD:
+        return numpy.array(points, dtype=float)
+    return points
+
+
+def distance_polyline_point(points, point):
+    """
+    Calculate the distance of ``point`` from the polyline through
+    ``points``, a list of (x, y) tuples or a NumPy array as returned by
+    ``pack_points()``.
+
+    A tuple is returned containing the distance, the point on the
+    polyline and the index of the closest segment. If segments are
+    equally close, the first one is returned.
+
+    >>> distance_polyline_point([(0., 0.), (10., 0.), (10., 10.)], (12., 4.))
+    (2.0, (10.0, 4.0), 1)
+    >>> points = pack_points([(x * 10, 0) for x in range(50)])
+    >>> distance_polyline_point(points, (95., 3.))
+    (3.0, (95.0, 0.0), 9)
+    """
+    if numpy is not None and isinstance(points, numpy.ndarray):
+        return _distance_polyline_point_numpy(points, point)
+
+    found = None
+    for i in range(len(points) - 1):
+        d, p = distance_line_point(points[i], points[i + 1], point)
+        if found is None or d < found[0]:
+            found = d, p, i
+    return found
+
+
+def _distance_polyline_point_numpy(points, point):
+    """
+    ``distance_polyline_point()`` for polylines packed in an array. The
+    closest segment is found by projecting the point on all segments at
+    once.
+    """
+    px, py = point
+    xs, ys = points[:, 0], points[:, 1]
+    x0, y0 = xs[:-1], ys[:-1]
+    dx, dy = xs[1:] - x0, ys[1:] - y0
+    ox, oy = px - x0, py - y0
+
+    line_len_sqr = dx * dx + dy * dy
+    projlen = dx * ox + dy * oy
+    # Both points of a segment are very near each other: use the start
+    short = line_len_sqr < 0.0001
+    line_len_sqr[short] = 1.0
+    projlen /= line_len_sqr
+    projlen[short] = 0.0
+    numpy.clip(projlen, 0.0, 1.0, out=projlen)
+
+    ex, ey = dx * projlen - ox, dy * projlen - oy
+    i = int((ex * ex + ey * ey).argmin())
+    start, end = tuple(points[i].tolist()), tuple(points[i + 1].tolist())
+    d, p = distance_line_point(start, end, point)
+    return d, p, i
+
+
 def intersect_line_line(line1_start, line1_end, line2_start, line2_end):
     """
     Find the point where the lines (segments) defined by
@@ -620,4 +701,51 @@ def rectangle_clip(recta, rectb):
     return (x, y, w, h)
 
 
+def merge_rectangles(rects, limit=16):
+    """
+    Merge rectangles ``rects`` into a smaller set of rectangles,
+    covering at least the same area. Two rectangles are merged if the
+    rectangle covering both is not larger than the two rectangles
+    together. No more than ``limit`` rectangles are returned: if needed,
+    rectangles are merged where that adds the least area.
+
+    >>> merge_rectangles([(0, 0, 10, 10), (5, 2, 10, 10), (100, 100, 10, 10)])
+    [(0, 0, 15, 12), (100, 100, 10, 10)]
+    >>> merge_rectangles([(0, 0, 10, 10), (100, 0, 10, 10), (0, 100, 10, 10)], limit=2)
+    [(0, 0, 10, 110), (100, 0, 10, 10)]
+    >>> merge_rectangles([])
+    []
+    """
+
+    def union(recta, rectb):
+        ax, ay, aw, ah = recta
+        bx, by, bw, bh = rectb
+        x, y = min(ax, bx), min(ay, by)
+        return x, y, max(ax + aw, bx + bw) - x, max(ay + ah, by + bh) - y
+
+    def area(rect):
+        return rect[2] * rect[3]
+
+    rects = [tuple(r) for r in rects]
+    while True:
+        merged = []
+        for rect in rects:
+            for i, m in enumerate(merged):
+                u = union(rect, m)
+                if area(u) <= area(rect) + area(m):
+                    merged[i] = u
+                    break
+            else:
+                if len(merged) < limit:
+                    merged.append(rect)
+                else:
+                    i = min(
+                        range(limit),
+                        key=lambda i: area(union(rect, merged[i])) - area(merged[i]),
+                    )
+                    merged[i] = union(rect, merged[i])
+        if len(merged) == len(rects):
+            return merged
+        rects = merged
+
 # vim:sw=4:et:ai
@@ -1,12 +1,20 @@
 """
 Module implements guides when moving items and handles around.
+
+The edges of the items are kept in an ``EdgeIndex`` per view, so
+the edges near a point can be found quickly.
 """
 from __future__ import division
 
-from builtins import map
+from bisect import bisect_left, bisect_right
 from builtins import object
-from functools import reduce
+from builtins import range
+from builtins import zip
+from itertools import chain
+from operator import itemgetter
+from weakref import WeakKeyDictionary
 
+from cairo import Matrix
 from simplegeneric import generic
 
 from gaphas.aspect import InMotion, HandleInMotion, PaintFocused
@@ -84,6 +92,196 @@ class LineGuide(ItemGuide):
                         yield h.pos.x
 
 
+class EdgeIndex(object):
+    """
+    Index of the vertical and horizontal edges (see ``Guide``) of
+    items, in canvas coordinates. It is a secondary index of a view
+    (see ``gaphas.index``), use ``edge_index()`` to obtain the index of
+    a view.
+    """
+
+    def __init__(self):
+        self._vertical = _SortedEdges()
+        self._horizontal = _SortedEdges()
+
+        # item -> (i2c, vertical edges, horizontal edges)
+        self._items = {}
+
+    def update_item(self, view, item, matrix_only=False):
+        """
+        Index the edges of ``item``.
+        """
+        i2c = Matrix(*view.canvas.get_matrix_i2c(item))
+        entry = self._items.get(item)
+        if matrix_only and entry and entry[0] == i2c:
+            return
+
+        if entry:
+            self.remove_item(item)
+
+        guide = Guide(item)
+        transform_point = i2c.transform_point
+        vertical = [transform_point(x, 0)[0] for x in guide.vertical()]
+        horizontal = [transform_point(0, y)[1] for y in guide.horizontal()]
+        for x in vertical:
+            self._vertical.add(x, item)
+        for y in horizontal:
+            self._horizontal.add(y, item)
+        self._items[item] = (i2c, vertical, horizontal)
+
+    def remove_item(self, item):
+        """
+        Remove ``item`` from the index.
+        """
+        try:
+            i2c, vertical, horizontal = self._items.pop(item)
+        except KeyError:
+            return
+        for x in vertical:
+            self._vertical.remove(x, item)
+        for y in horizontal:
+            self._horizontal.remove(y, item)
+
+    def clear(self):
+        """
+        Remove all items from the index.
+        """
+        self._vertical = _SortedEdges()
+        self._horizontal = _SortedEdges()
+        self._items.clear()
+
+    def find_vertical(self, x0, x1):
+        """
+        Iterate the vertical edges between ``x0`` and ``x1`` (canvas
+        coordinates), as (x, item) tuples.
+        """
+        return self._vertical.find(x0, x1)
+
+    def find_horizontal(self, y0, y1):
+        """
+        Iterate the horizontal edges between ``y0`` and ``y1`` (canvas
+        coordinates), as (y, item) tuples.
+        """
+        return self._horizontal.find(y0, y1)
+
+
+class _SortedEdges(object):
+    """
+    Edge positions, sorted, with the items they belong to.
+
+    The edges are kept in blocks of sorted edges, so an edge is sorted
+    in or removed without moving all edges that follow it. New edges
+    are collected and only sorted in when the edges are used, so the
+    edges of all items of a view are sorted at once.
+
+    >>> edges = _SortedEdges()
+    >>> edges.add(10, 'a')
+    >>> edges.add(0, 'b')
+    >>> edges.add(10, 'c')
+    >>> edges.remove(10, 'a')
+    >>> list(edges.find(5, 10))
+    [(10, 'c')]
+    """
+
+    # Blocks are split when they grow beyond twice this size
+    BLOCK_SIZE = 500
+
+    def __init__(self):
+        # Blocks of sorted values, the items and the last value per block
+        self._values = []
+        self._items = []
+        self._maxes = []
+        # (value, item) tuples not sorted in yet
+        self._added = []
+
+    def add(self, value, item):
+        self._added.append((value, item))
+
+    def remove(self, value, item):
+        self._sort_in()
+        values, items, maxes = self._values, self._items, self._maxes
+        i = bisect_left(maxes, value)
+        j = bisect_left(values[i], value)
+        # Edges with the same value may continue in the next block
+        while items[i][j] is not item:
+            j += 1
+            if j == len(values[i]):
+                i, j = i + 1, 0
+        del values[i][j]
+        del items[i][j]
+        if values[i]:
+            maxes[i] = values[i][-1]
+        else:
+            del values[i], items[i], maxes[i]
+
+    def find(self, lower, upper):
+        self._sort_in()
+        values, items = self._values, self._items
+        i = bisect_left(self._maxes, lower)
+        if i == len(values):
+            return
+        j = bisect_left(values[i], lower)
+        for block_values, block_items in zip(values[i:], items[i:]):
+            end = bisect_right(block_values, upper)
+            for k in range(j, end):
+                yield block_values[k], block_items[k]
+            if end < len(block_values):
+                return
+            j = 0
+
+    def _sort_in(self):
+        """
+        Sort the new edges in. Many new edges are sorted in by sorting
+        all edges again.
+        """
+        added = self._added
+        if not added:
+            return
+        self._added = []
+        if len(added) > len(self._maxes) * 8:
+            edges = list(zip(chain(*self._values), chain(*self._items)))
+            edges.extend(added)
+            edges.sort(key=itemgetter(0))
+            size = self.BLOCK_SIZE
+            blocks = [edges[i : i + size] for i in range(0, len(edges), size)]
+            self._values = [[v for v, _ in block] for block in blocks]
+            self._items = [[item for _, item in block] for block in blocks]
+            self._maxes = [block[-1] for block in self._values]
+            return
+
+        values, items, maxes = self._values, self._items, self._maxes
+        for value, item in added:
+            i = min(bisect_left(maxes, value), len(maxes) - 1)
+            block_values = values[i]
+            j = bisect_right(block_values, value)
+            block_values.insert(j, value)
+            items[i].insert(j, item)
+            maxes[i] = block_values[-1]
+            if len(block_values) > 2 * self.BLOCK_SIZE:
+                half = len(block_values) // 2
+                values.insert(i + 1, block_values[half:])
+                items.insert(i + 1, items[i][half:])
+                maxes.insert(i, block_values[half - 1])
+                del block_values[half:]
+                del items[i][half:]
+
+
+_edge_indexes = WeakKeyDictionary()
+
+
+def edge_index(view):
+    """
+    Return the ``EdgeIndex`` of ``view``. The index is registered on
+    the view when it is first used.
+    """
+    try:
+        return _edge_indexes[view]
+    except KeyError:
+        index = _edge_indexes[view] = EdgeIndex()
+        view.register_index(index)
+        return index
+
+
 class Guides(object):
     def __init__(self, v, h):
         self.v = v
@@ -105,51 +303,46 @@ class GuideMixin(object):
 
     def find_vertical_guides(self, item_vedges, pdx, height, excluded_items):
         view = self.view
-        item = self.item
-        i2v = self.view.get_matrix_i2v
+        index = edge_index(view)
+        get_bounds = view.get_item_bounding_box
+        c2v = view.matrix.transform_point
+        v2c = Matrix(*view.matrix)
+        v2c.invert()
+        v2c = v2c.transform_point
         margin = self.MARGIN
-        items = []
-        for x in item_vedges:
-            items.append(
-                view.get_items_in_rectangle((x - margin, 0, margin * 2, height))
-            )
-        try:
-            guides = list(
-                map(Guide, reduce(set.union, list(map(set, items))) - excluded_items)
-            )
-        except TypeError:
-            guides = []
 
         vedges = set()
-        for g in guides:
-            for x in g.vertical():
-                vedges.add(i2v(g.item).transform_point(x, 0)[0])
+        for x in item_vedges:
+            x0, x1 = v2c(x - margin, 0)[0], v2c(x + margin, 0)[0]
+            for e, item in index.find_vertical(min(x0, x1), max(x0, x1)):
+                if item in excluded_items:
+                    continue
+                # Only items in the view, like the guide line
+                bx, by, bw, bh = get_bounds(item)
+                if by <= height and by + bh >= 0:
+                    vedges.add(c2v(e, 0)[0])
         dx, edges_x = self.find_closest(item_vedges, vedges)
         return dx, edges_x
 
     def find_horizontal_guides(self, item_hedges, pdy, width, excluded_items):
         view = self.view
-        item = self.item
-        i2v = self.view.get_matrix_i2v
+        index = edge_index(view)
+        get_bounds = view.get_item_bounding_box
+        c2v = view.matrix.transform_point
+        v2c = Matrix(*view.matrix)
+        v2c.invert()
+        v2c = v2c.transform_point
         margin = self.MARGIN
-        items = []
-        for y in item_hedges:
-            items.append(
-                view.get_items_in_rectangle((0, y - margin, width, margin * 2))
-            )
-        try:
-            guides = list(
-                map(Guide, reduce(set.union, list(map(set, items))) - excluded_items)
-            )
-        except TypeError:
-            guides = []
 
-        # Translate edges to canvas or view coordinates
         hedges = set()
-        for g in guides:
-            for y in g.horizontal():
-                hedges.add(i2v(g.item).transform_point(0, y)[1])
-
+        for y in item_hedges:
+            y0, y1 = v2c(0, y - margin)[1], v2c(0, y + margin)[1]
+            for e, item in index.find_horizontal(min(y0, y1), max(y0, y1)):
+                if item in excluded_items:
+                    continue
+                bx, by, bw, bh = get_bounds(item)
+                if bx <= width and bx + bw >= 0:
+                    hedges.add(c2v(0, e)[1])
         dy, edges_y = self.find_closest(item_hedges, hedges)
         return dy, edges_y
 
@@ -187,11 +380,16 @@ class GuideMixin(object):
             view.queue_draw_area(0, y - 1, w, y + 2)
 
     def find_closest(self, item_edges, edges):
+        edges = sorted(edges)
         delta = 0
         min_d = 1000
         closest = []
-        for e in edges:
-            for ie in item_edges:
+        for ie in item_edges:
+            # The edges closest to ie, on either side
+            i = bisect_left(edges, ie)
+            lo = bisect_left(edges, edges[i - 1]) if i else i
+            hi = bisect_right(edges, edges[i]) if i < len(edges) else i
+            for e in edges[lo:hi]:
                 d = abs(e - ie)
                 if d < min_d:
                     min_d = d
@@ -212,7 +410,7 @@ class GuidedItemInMotion(GuideMixin, ItemInMotion):
     same location.
     """
 
-    def move(self, pos):
+    def snap(self, pos):
         item = self.item
         view = self.view
 
@@ -231,18 +429,13 @@ class GuidedItemInMotion(GuideMixin, ItemInMotion):
         item_hedges = [transform(0, y)[1] + pdy for y in item_guide.horizontal()]
         dy, edges_y = self.find_horizontal_guides(item_hedges, pdy, w, excluded_items)
 
-        newpos = px + dx, py + dy
-
-        # Call super class, with new position
-        sink = super(GuidedItemInMotion, self).move(newpos)
-
         self.queue_draw_guides()
 
         view.guides = Guides(edges_x, edges_y)
 
         self.queue_draw_guides()
 
-        return sink
+        return px + dx, py + dy
 
     def stop_move(self):
         self.queue_draw_guides()
@@ -0,0 +1,330 @@
+"""
+Secondary indexes for views.
+
+A view keeps a spatial index (a Quadtree) of the bounding boxes of its
+items. Secondary indexes are kept up to date for the same items, but
+index more detailed geometry. They are registered on a view with
+``View.register_index()``.
+
+A secondary index implements:
+
+``update_item(view, item, matrix_only=False)``
+    Index ``item``. If ``matrix_only`` is True, only the item's
+    matrix (or the view's matrix) changed.
+``remove_item(item)``
+    Remove ``item`` from the index.
+``clear()``
+    Remove all items from the index.
+"""
+from __future__ import absolute_import
+from __future__ import division
+
+from builtins import object
+from builtins import zip
+from operator import itemgetter
+
+from cairo import Matrix
+from simplegeneric import generic
+
+from .connector import LinePort, PointPort
+from .geometry import distance_point_point, rectangle_contains
+from .quadtree import Quadtree
+
+
+@generic
+def port_points(port):
+    """
+    Return the points (in item coordinates) that define the geometry of
+    ``port``. The port lies within the bounding box of these points.
+
+    None is returned if the geometry of the port is unknown. In that
+    case the bounding box of the item is used.
+    """
+    return None
+
+
+@port_points.when_type(LinePort)
+def _line_port_points(port):
+    return port.start, port.end
+
+
+@port_points.when_type(PointPort)
+def _point_port_points(port):
+    return (port.point,)
+
+
+class HandlePortIndex(object):
+    """
+    Index of the handles and ports of items, in canvas coordinates.
+
+    Handles and ports can be looked up by (true) distance to a point.
+    """
+
+    def __init__(self):
+        self._handles = Quadtree()
+        self._ports = Quadtree()
+
+        # item -> (i2c, c2i, handle keys, port keys)
+        self._items = {}
+
+    def update_item(self, view, item, matrix_only=False):
+        """
+        Index the handles and ports of ``item``.
+        """
+        i2c = Matrix(*view.canvas.get_matrix_i2c(item))
+        entry = self._items.get(item)
+        if matrix_only and entry and entry[0] == i2c:
+            return
+
+        if entry:
+            self.remove_item(item)
+
+        c2i = Matrix(*i2c)
+        c2i.invert()
+        transform_point = i2c.transform_point
+
+        handle_keys = []
+        for handle in item.handles():
+            x, y = transform_point(*handle.pos)
+            key = (item, handle)
+            _add(self._handles, key, (x, y, 0, 0))
+            handle_keys.append(key)
+
+        port_keys = []
+        item_bounds = None
+        for port in item.ports():
+            points = port_points(port)
+            if points:
+                bounds = _bounds([transform_point(*p) for p in points])
+            else:
+                if item_bounds is None:
+                    item_bounds = _item_bounds(view, item)
+                bounds = item_bounds
+            key = (item, port)
+            _add(self._ports, key, bounds)
+            port_keys.append(key)
+
+        self._items[item] = (i2c, c2i, handle_keys, port_keys)
+
+    def remove_item(self, item):
+        """
+        Remove ``item`` from the index.
+        """
+        try:
+            i2c, c2i, handle_keys, port_keys = self._items.pop(item)
+        except KeyError:
+            return
+        for key in handle_keys:
+            self._handles.remove(key)
+        for key in port_keys:
+            self._ports.remove(key)
+
+    def clear(self):
+        """
+        Remove all items from the index.
+        """
+        self._handles.clear()
+        self._ports.clear()
+        self._items.clear()
+
+    def find_handles(self, point, k=1, max_distance=None, accept=None):
+        """
+        Find the ``k`` handles closest to ``point`` (canvas coordinates).
+        Handles for which ``accept(item, handle)`` returns False are
+        ignored.
+
+        Returns a list of (item, handle, distance) tuples, closest first.
+        """
+        handles = self._handles
+        if accept:
+
+            def distance(key):
+                if accept(*key):
+                    x, y, _, _ = handles.get_bounds(key)
+                    return distance_point_point((x, y), point)
+
+        else:
+            distance = None
+
+        return [
+            (item, handle, d)
+            for (item, handle), d in handles.find_nearest(
+                point, k, max_distance, distance
+            )
+        ]
+
+    def find_handles_in_rectangle(self, rect):
+        """
+        Find the handles in ``rect`` (x, y, width, height, in canvas
+        coordinates).
+
+        Returns a list of (item, handle) tuples.
+        """
+        return list(self._handles.find_intersect(rect))
+
+    def find_ports(self, point, k=1, max_distance=None, accept=None):
+        """
+        Find the ``k`` ports closest to ``point`` (canvas coordinates).
+        The distance is calculated with ``Port.glue()``. Ports for which
+        ``accept(item, port)`` returns False are ignored.
+
+        Returns a list of (item, port, glue point, distance) tuples,
+        closest first. The glue point is in canvas coordinates.
+        """
+        glue_points = {}
+
+        def distance(key):
+            item, port = key
+            if accept and not accept(item, port):
+                return None
+            i2c, c2i, _, _ = self._items[item]
+            pg, d = port.glue(c2i.transform_point(*point))
+            glue_point = i2c.transform_point(*pg)
+            glue_points[key] = glue_point
+            return distance_point_point(glue_point, point)
+
+        return [
+            (item, port, glue_points[item, port], d)
+            for (item, port), d in self._ports.find_nearest(
+                point, k, max_distance, distance
+            )
+        ]
+
+    def find_ports_in_rectangle(self, rect):
+        """
+        Find the ports that may lie in ``rect`` (x, y, width, height, in
+        canvas coordinates).
+
+        Returns a list of (item, port, i2c, c2i, bounds) tuples. The
+        bounds of the port are in canvas coordinates.
+        """
+        items = self._items
+        get_bounds = self._ports.get_bounds
+        found = []
+        for key in self._ports.find_intersect(rect):
+            item, port = key
+            i2c, c2i, _, _ = items[item]
+            found.append((item, port, i2c, c2i, get_bounds(key)))
+        return found
+
+
+class GlueSession(object):
+    """
+    Find ports to glue to while a handle is dragged.
+
+    The ports in a region around the pointer are copied from a
+    ``HandlePortIndex`` once. Queries are answered from this copy, until
+    the pointer moves out of the region. The items are assumed not to
+    move during the drag (other than the dragged item, which is not
+    glued to).
+
+    ``margin`` is the distance (in canvas coordinates) the pointer can
+    move before a new copy is made.
+    """
+
+    def __init__(self, index, margin=100):
+        self._index = index
+        self.margin = margin
+        self._region = None
+        self._ports = []
+
+    def find_port(self, point, max_distance, accept=None):
+        """
+        Find the port closest to ``point`` (canvas coordinates), within
+        ``max_distance``. Ports for which ``accept(item, port)`` returns
+        False are ignored.
+
+        Returns an (item, port, glue point, distance) tuple, or None.
+        """
+        x, y = point
+        region = self._region
+        if not (
+            region
+            and region[0] <= x - max_distance
+            and region[1] <= y - max_distance
+            and x + max_distance <= region[0] + region[2]
+            and y + max_distance <= region[1] + region[3]
+        ):
+            size = self.margin + max_distance
+            self._region = (x - size, y - size, 2 * size, 2 * size)
+            self._ports = self._index.find_ports_in_rectangle(self._region)
+
+        # The glue point lies within the bounds of a port, so ports are
+        # glued in order of the (squared) distance to their bounds, until
+        # that distance exceeds the distance found
+        max_d2 = max_distance * max_distance
+        candidates = []
+        for entry in self._ports:
+            bx, by, bw, bh = entry[4]
+            dx = max(bx - x, 0, x - bx - bw)
+            dy = max(by - y, 0, y - by - bh)
+            d2 = dx * dx + dy * dy
+            if d2 <= max_d2:
+                candidates.append((d2, entry))
+        candidates.sort(key=itemgetter(0))
+
+        found = None
+        for d2, (item, port, i2c, c2i, bounds) in candidates:
+            if found is not None and d2 >= found[3] * found[3]:
+                break
+            if accept and not accept(item, port):
+                continue
+            pg, d = port.glue(c2i.transform_point(x, y))
+            glue_point = i2c.transform_point(*pg)
+            d = distance_point_point(glue_point, point)
+            if d <= max_distance and (found is None or d < found[3]):
+                found = item, port, glue_point, d
+        return found
+
+    def clear(self):
+        """
+        Forget the ports found so far.
+        """
+        self._region = None
+        self._ports = []
+
+
+def _bounds(points):
+    """
+    Return the bounding box (x, y, width, height) of ``points``.
+    """
+    xs, ys = list(zip(*points))
+    x, y = min(xs), min(ys)
+    return x, y, max(xs) - x, max(ys) - y
+
+
+def _item_bounds(view, item):
+    """
+    Return the bounding box of ``item`` in canvas coordinates.
+    """
+    v2c = Matrix(*view.matrix)
+    v2c.invert()
+    x, y, w, h = view.get_item_bounding_box(item)
+    return _bounds(
+        [
+            v2c.transform_point(x, y),
+            v2c.transform_point(x + w, y),
+            v2c.transform_point(x, y + h),
+            v2c.transform_point(x + w, y + h),
+        ]
+    )
+
+
+def _add(tree, key, bounds):
+    """
+    Add ``key`` to ``tree``. The tree is resized if the bounds do not
+    fit, leaving some room to grow.
+    """
+    if not rectangle_contains(bounds, tree.bounds):
+        x, y, w, h = bounds
+        x1, y1 = x + w, y + h
+        if len(tree):
+            tx, ty, tw, th = tree.bounds
+            x, y = min(x, tx), min(y, ty)
+            x1, y1 = max(x1, tx + tw), max(y1, ty + th)
+        margin = max(x1 - x, y1 - y, 100.0) / 2.0
+        tree.resize((x - margin, y - margin, x1 - x + 2 * margin, y1 - y + 2 * margin))
+    tree.add(key, bounds)
+
+
+# vim:sw=4:et:ai
@@ -7,9 +7,7 @@ from builtins import map
 from builtins import object
 from builtins import range
 from builtins import zip
-from functools import reduce
 from math import atan2
-from weakref import WeakKeyDictionary
 
 try:
     # python 3.0 (better be prepared)
@@ -18,9 +16,10 @@ except ImportError:
     from .weakset import WeakSet
 
 from .matrix import Matrix
-from .geometry import distance_line_point, distance_rectangle_point
+from .geometry import distance_polyline_point, distance_rectangle_point
+from .geometry import pack_points
 from .connector import Handle, LinePort
-from .solver import solvable, WEAK, VERY_STRONG, REQUIRED
+from .solver import solvable, Variable, WEAK, VERY_STRONG, REQUIRED
 from .constraint import (
     EqualsConstraint,
     LessThanConstraint,
@@ -40,6 +39,8 @@ class Item(object):
     - canvas: canvas, which owns an item
     - constraints: list of item constraints, automatically registered
       when the item is added to a canvas; may be extended in subclasses
+    - pixel_hit_test: the item is found where it is drawn (see
+      ``gaphas.tiling.HitTestCache``); if False ``point()`` is used
 
     Private:
 
@@ -48,12 +49,16 @@ class Item(object):
     - _ports:       list of ports, connectable areas of an item
     - _matrix_i2c:  item to canvas coordinates matrix
     - _matrix_c2i:  canvas to item coordinates matrix
-    - _matrix_i2v:  item to view coordinates matrices
-    - _matrix_v2i:  view to item coordinates matrices
     - _sort_key:  used to sort items
     - _canvas_projections:  used to sort items
+    - _update_generation:  incremented for every full update of the item,
+      used to invalidate cached drawings
     """
 
+    # Items that paint outside of their outline (e.g. images) or that can
+    # be found outside of it should not be hit tested by pixel
+    pixel_hit_test = True
+
     def __init__(self):
         self._canvas = None
         self._matrix = Matrix()
@@ -65,11 +70,11 @@ class Item(object):
         self._matrix_i2c = None
         self._matrix_c2i = None
 
-        # used by gaphas.view.GtkView to hold item 2 view matrices (view=key)
-        self._matrix_i2v = WeakKeyDictionary()
-        self._matrix_v2i = WeakKeyDictionary()
         self._canvas_projections = WeakSet()
 
+        # used by gaphas.canvas.Canvas to mark full updates
+        self._update_generation = 0
+
     @observed
     def _set_canvas(self, canvas):
         """
@@ -196,9 +201,37 @@ class Item(object):
           (True/False)
         - draw_all: a request to draw everything, for bounding box
           calculations
+        - simplified: the item is small on screen, details (such as text)
+          can be left out
         """
         pass
 
+    def draw_simplified(self, context):
+        """
+        Render a cheap proxy of the item. It is used instead of
+        ``draw()`` if the item is very small on screen (see
+        ``View.level_of_detail``).
+
+        By default the area covered by the handles is filled.
+        """
+        handles = self._handles
+        if handles:
+            xs, ys = list(zip(*[h.pos for h in handles]))
+            x, y = min(xs), min(ys)
+            cr = context.cairo
+            cr.rectangle(x, y, max(xs) - x, max(ys) - y)
+            cr.fill()
+
+    def bounds(self):
+        """
+        Return the bounding box (x, y, width, height) of everything
+        ``draw()`` renders, in item coordinates, or None if it is not
+        known. In that case the item is drawn to find out.
+
+        Handles do not need to be included.
+        """
+        return None
+
     def handles(self):
         """
         Return a list of handles owned by the item.
@@ -280,10 +313,11 @@ class Item(object):
 
     def __getstate__(self):
         """
-        Persist all, but calculated values (``_matrix_?2?``).
+        Persist all, but calculated values (``_matrix_?2?``,
+        ``_update_generation``).
         """
         d = dict(self.__dict__)
-        for n in ("_matrix_i2c", "_matrix_c2i", "_matrix_i2v", "_matrix_v2i"):
+        for n in ("_matrix_i2c", "_matrix_c2i", "_update_generation"):
             try:
                 del d[n]
             except KeyError:
@@ -297,8 +331,7 @@ class Item(object):
         """
         for n in ("_matrix_i2c", "_matrix_c2i"):
             setattr(self, n, None)
-        for n in ("_matrix_i2v", "_matrix_v2i"):
-            setattr(self, n, WeakKeyDictionary())
+        self._update_generation = 0
         self.__dict__.update(state)
         self._canvas_projections = WeakSet(state["_canvas_projections"])
 
@@ -313,8 +346,14 @@ class Element(Item):
      NW +---+ NE
         |   |
      SW +---+ SE
+
+    If ``bounds_from_handles`` is True, the element only draws within
+    the area of its handles (and strokes of the default line width on
+    its edges). The bounding box is derived from the handles.
     """
 
+    bounds_from_handles = False
+
     min_width = solvable(strength=REQUIRED, varname="_min_width")
     min_height = solvable(strength=REQUIRED, varname="_min_height")
 
@@ -446,6 +485,23 @@ class Element(Item):
             list(map(float, (pnw.x, pnw.y, pse.x, pse.y))), pos
         )
 
+    def bounds(self):
+        """
+        Bounding box of the element, if ``bounds_from_handles`` is set.
+        Half of the default line width is added on every side.
+
+        >>> e = Element(20, 10)
+        >>> e.bounds()
+        >>> e.bounds_from_handles = True
+        >>> e.bounds()
+        (-1.0, -1.0, 22.0, 12.0)
+        """
+        if not self.bounds_from_handles:
+            return None
+        h = self._handles
+        x, y = list(map(float, h[NW].pos))
+        return x - 1.0, y - 1.0, self.width + 2.0, self.height + 2.0
+
 
 class Line(Item):
     """
@@ -480,6 +536,9 @@ class Line(Item):
         self._horizontal = False
         self._head_angle = self._tail_angle = 0
 
+        # (variable changes, number of handles, packed handle positions)
+        self._packed_handles = None
+
     @observed
     def _set_line_width(self, line_width):
         self._line_width = line_width
@@ -492,6 +551,9 @@ class Line(Item):
 
     fuzziness = reversible_property(lambda s: s._fuzziness, _set_fuzziness)
 
+    # A line with a fuzzy margin can be found next to where it is drawn
+    pixel_hit_test = property(lambda s: not s._fuzziness)
+
     def _update_orthogonal_constraints(self, orthogonal):
         """
         Update the constraints required to maintain the orthogonal line.
@@ -673,15 +735,34 @@ class Line(Item):
         >>> a.closest_segment((4, 5))
         (0.7071067811865476, (4.5, 4.5), 0)
         """
-        h = self._handles
-        hpos = list(map(getattr, h, ["pos"] * len(h)))
+        return distance_polyline_point(self._packed_handle_positions(), pos)
 
-        # create a list of (distance, point_on_line) tuples:
-        distances = list(
-            map(distance_line_point, hpos[:-1], hpos[1:], [pos] * (len(hpos) - 1))
-        )
-        distances, pols = list(zip(*distances))
-        return reduce(min, list(zip(distances, pols, list(range(len(distances))))))
+    def _packed_handle_positions(self):
+        """
+        Return the handle positions, packed by ``pack_points()``. The
+        packed positions are kept until a variable (e.g. of a handle) is
+        changed or a handle is added or removed.
+        """
+        handles = self._handles
+        packed = self._packed_handles
+        if packed and packed[0] == Variable.changes and packed[1] == len(handles):
+            return packed[2]
+        points = [(float(p.x), float(p.y)) for p in (h.pos for h in handles)]
+        self._packed_handles = Variable.changes, len(handles), pack_points(points)
+        return self._packed_handles[2]
+
+    def __getstate__(self):
+        """
+        Persist all, but the packed handle positions: the number of
+        variable changes is not the same after loading.
+        """
+        d = super(Line, self).__getstate__()
+        d.pop("_packed_handles", None)
+        return d
+
+    def __setstate__(self, state):
+        self._packed_handles = None
+        super(Line, self).__setstate__(state)
 
     def point(self, pos):
         """
@@ -710,10 +791,26 @@ class Line(Item):
         """
         context.cairo.line_to(0, 0)
 
+    def draw_simplified(self, context):
+        """
+        Draw a straight, one pixel wide, segment from the first to the
+        last handle.
+        """
+        cr = context.cairo
+        cr.move_to(*self._handles[0].pos)
+        cr.line_to(*self._handles[-1].pos)
+        cr.save()
+        cr.identity_matrix()
+        cr.set_line_width(1)
+        cr.stroke()
+        cr.restore()
+
     def draw(self, context):
         """
         Draw the line itself.
         See Item.draw(context).
+
+        Line ends are left out when the line is drawn simplified.
         """
 
         def draw_line_end(pos, angle, draw):
@@ -728,10 +825,16 @@ class Line(Item):
 
         cr = context.cairo
         cr.set_line_width(self.line_width)
-        draw_line_end(self._handles[0].pos, self._head_angle, self.draw_head)
+        if context.simplified:
+            cr.move_to(*self._handles[0].pos)
+        else:
+            draw_line_end(self._handles[0].pos, self._head_angle, self.draw_head)
         for h in self._handles[1:-1]:
             cr.line_to(*h.pos)
-        draw_line_end(self._handles[-1].pos, self._tail_angle, self.draw_tail)
+        if context.simplified:
+            cr.line_to(*self._handles[-1].pos)
+        else:
+            draw_line_end(self._handles[-1].pos, self._tail_angle, self.draw_tail)
         cr.stroke()
 
         ### debug code to draw line ports
@@ -6,10 +6,15 @@ Matrix
 ------
 Small utility class wrapping cairo.Matrix. The `Matrix` class adds
 state preservation capabilities.
+
+MatrixStore
+-----------
+Compact storage for the item matrices of a view.
 """
 from __future__ import absolute_import
 from __future__ import division
 
+from array import array
 from builtins import object
 
 __version__ = "$Revision$"
@@ -102,4 +107,116 @@ class Matrix(object):
         return "Matrix(%g, %g, %g, %g, %g, %g)" % tuple(self._matrix)
 
 
+class MatrixStore(object):
+    """
+    Item to view matrices of a view, stored in a flat array. Every item
+    gets a slot (a dense ID), slots of discarded items are reused. The
+    ``cairo.Matrix`` objects are only created when a matrix is
+    requested, and reused until the matrix of the item is set again.
+    The inverse (view to item) matrix is only calculated when requested.
+
+    >>> store = MatrixStore()
+    >>> store.set("item", cairo.Matrix(2, 0, 0, 2, 10, 20))
+    >>> "item" in store, len(store)
+    (True, 1)
+    >>> store.get("item")
+    cairo.Matrix(2, 0, 0, 2, 10, 20)
+    >>> store.get("item") is store.get("item")
+    True
+    >>> store.get_inverse("item").transform_point(12, 22)
+    (1.0, 1.0)
+    >>> store.discard("item")
+    >>> store.get("item")
+    Traceback (most recent call last):
+    ...
+    KeyError: 'item'
+    """
+
+    def __init__(self):
+        # item -> slot
+        self._slots = {}
+        self._free = []
+
+        # 6 values per slot
+        self._matrices = array("d")
+
+        # per slot: the matrix and the inverse matrix, None until requested
+        self._objects = []
+        self._inverses = []
+
+    def __contains__(self, item):
+        return item in self._slots
+
+    def __len__(self):
+        return len(self._slots)
+
+    def set(self, item, matrix):
+        """
+        Store ``matrix`` (a ``cairo.Matrix``) for ``item``.
+        """
+        try:
+            slot = self._slots[item]
+        except KeyError:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._objects)
+                self._matrices.extend(matrix)
+                self._objects.append(None)
+                self._inverses.append(None)
+            self._slots[item] = slot
+        i = slot * 6
+        self._matrices[i : i + 6] = array("d", matrix)
+        self._objects[slot] = None
+        self._inverses[slot] = None
+
+    def get(self, item):
+        """
+        Return the matrix of ``item``, as a ``cairo.Matrix``. The same
+        object is returned until the matrix is set again: it should not
+        be modified. Raises KeyError if no matrix is stored for the item.
+        """
+        slot = self._slots[item]
+        matrix = self._objects[slot]
+        if matrix is None:
+            i = slot * 6
+            matrix = self._objects[slot] = cairo.Matrix(*self._matrices[i : i + 6])
+        return matrix
+
+    def get_inverse(self, item):
+        """
+        Return the inverse of the matrix of ``item``, as a
+        ``cairo.Matrix``. The same object is returned until the matrix
+        is set again: it should not be modified. Raises KeyError if no
+        matrix is stored for the item.
+        """
+        slot = self._slots[item]
+        inverse = self._inverses[slot]
+        if inverse is None:
+            i = slot * 6
+            inverse = self._inverses[slot] = cairo.Matrix(*self._matrices[i : i + 6])
+            inverse.invert()
+        return inverse
+
+    def discard(self, item):
+        """
+        Remove the matrix of ``item``, if any.
+        """
+        slot = self._slots.pop(item, None)
+        if slot is not None:
+            self._objects[slot] = None
+            self._inverses[slot] = None
+            self._free.append(slot)
+
+    def clear(self):
+        """
+        Remove all matrices.
+        """
+        self._slots.clear()
+        del self._free[:]
+        del self._matrices[:]
+        del self._objects[:]
+        del self._inverses[:]
+
+
 # vim:sw=4:et
@@ -9,11 +9,17 @@ and handles).
 from __future__ import division
 
 from builtins import object
+from builtins import zip
+from collections import namedtuple
+from math import floor
+from weakref import WeakKeyDictionary
 
 __version__ = "$Revision$"
 # $HeadURL$
 
 from cairo import Matrix, ANTIALIAS_NONE, LINE_JOIN_ROUND
+from cairo import Context as CairoContext, ImageSurface, FORMAT_ARGB32
+from cairo import RecordingSurface, CONTENT_COLOR_ALPHA, FontOptions
 
 from gaphas.canvas import Context
 from gaphas.geometry import Rectangle
@@ -88,18 +94,136 @@ class DrawContext(Context):
     Special context for draw()'ing the item. The draw-context contains
     stuff like the cairo context and properties like selected and
     focused.
+
+    An ``ItemPainter`` fills the same draw-context for every item it
+    draws, so items should not keep a reference to it. The common
+    properties are slots; extra keyword arguments end up in the
+    instance dictionary, as with ``Context``.
     """
 
+    __slots__ = (
+        "painter",
+        "cairo",
+        "_area",
+        "_item",
+        "selected",
+        "focused",
+        "hovered",
+        "dropzone",
+        "draw_all",
+        "simplified",
+    )
+
     deprecated = False
 
     def __init__(self, **kwargs):
-        super(DrawContext, self).__init__(**kwargs)
+        set_attr = object.__setattr__
+        set_attr(self, "simplified", False)
+        for key, value in kwargs.items():
+            set_attr(self, key, value)
+
+    def _fill(
+        self,
+        painter,
+        cairo,
+        area,
+        item,
+        selected,
+        focused,
+        hovered,
+        dropzone,
+        draw_all,
+        simplified,
+    ):
+        """
+        Fill the context for drawing ``item``.
+        """
+        set_attr = object.__setattr__
+        set_attr(self, "painter", painter)
+        set_attr(self, "cairo", cairo)
+        set_attr(self, "_area", area)
+        set_attr(self, "_item", item)
+        set_attr(self, "selected", selected)
+        set_attr(self, "focused", focused)
+        set_attr(self, "hovered", hovered)
+        set_attr(self, "dropzone", dropzone)
+        set_attr(self, "draw_all", draw_all)
+        set_attr(self, "simplified", simplified)
+
+
+LevelOfDetail = namedtuple("LevelOfDetail", "simplified proxy")
+LevelOfDetail.__doc__ = """
+Thresholds, in pixels, for drawing items that are small on screen (see
+``View.level_of_detail``). Items smaller than ``simplified`` are drawn
+with ``DrawContext.simplified`` set, so they can leave out details.
+Items smaller than ``proxy`` are drawn by ``Item.draw_simplified()``.
+"""
+
+
+def _level_of_detail(view, item):
+    """
+    Return a tuple (simplified, proxy), telling how ``item`` should be
+    drawn in ``view``.
+    """
+    lod = view.level_of_detail
+    if not lod:
+        return False, False
+
+    handles = item.handles()
+    if handles:
+        transform_point = view.get_matrix_i2v(item).transform_point
+        xs, ys = list(zip(*[transform_point(*h.pos) for h in handles]))
+        size = max(max(xs) - min(xs), max(ys) - min(ys))
+    else:
+        try:
+            x, y, w, h = view.get_item_bounding_box(item)
+        except KeyError:
+            return False, False
+        size = max(w, h)
+    return size < lod.simplified, size < lod.proxy
 
 
 class ItemPainter(Painter):
+    """
+    Draw the items.
+
+    If ``cache`` is True, the drawing of each item is recorded (in item
+    coordinates) and replayed, until the item is updated by the canvas or
+    its selected, focused, hovered or dropzone state changes. Moving
+    items or zooming does not require the items to draw again.
+    """
 
     draw_all = False
 
+    def __init__(self, view=None, cache=False):
+        super(ItemPainter, self).__init__(view)
+        self.cache = cache
+        # item -> (state, recording surface)
+        self._recordings = WeakKeyDictionary()
+        # filled for every item drawn
+        self._context = DrawContext()
+
+    def set_view(self, view):
+        self.view = view
+        self._recordings.clear()
+
+    def _draw_context(self, item, cairo, area, simplified=False):
+        view = self.view
+        context = self._context
+        context._fill(
+            self,
+            cairo,
+            area,
+            item,
+            item in view.selected_items,
+            item is view.focused_item,
+            item is view.hovered_item,
+            item is view.dropzone_item,
+            self.draw_all,
+            simplified,
+        )
+        return context
+
     def _draw_item(self, item, cairo, area=None):
         view = self.view
         cairo.save()
@@ -107,23 +231,57 @@ class ItemPainter(Painter):
             cairo.set_matrix(view.matrix)
             cairo.transform(view.canvas.get_matrix_i2c(item))
 
-            item.draw(
-                DrawContext(
-                    painter=self,
-                    cairo=cairo,
-                    _area=area,
-                    _item=item,
-                    selected=(item in view.selected_items),
-                    focused=(item is view.focused_item),
-                    hovered=(item is view.hovered_item),
-                    dropzone=(item is view.dropzone_item),
-                    draw_all=self.draw_all,
-                )
-            )
+            if self.draw_all:
+                detail = (False, False)
+            else:
+                detail = _level_of_detail(view, item)
+
+            # Only plain cairo contexts can be recorded, wrappers (such as
+            # the FreeHandCairoContext) have to draw the item themselves.
+            if self.cache and isinstance(cairo, CairoContext):
+                self._draw_recording(item, cairo, area, detail)
+            else:
+                self._draw_detail(item, cairo, area, detail)
 
         finally:
             cairo.restore()
 
+    def _draw_detail(self, item, cairo, area, detail):
+        simplified, proxy = detail
+        context = self._draw_context(item, cairo, area, simplified)
+        if proxy:
+            item.draw_simplified(context)
+        else:
+            item.draw(context)
+
+    def _draw_recording(self, item, cairo, area, detail):
+        """
+        Replay the recorded drawing of the item. The item is recorded
+        first if it changed since the last recording.
+        """
+        view = self.view
+        state = (
+            item._update_generation,
+            item in view.selected_items,
+            item is view.focused_item,
+            item is view.hovered_item,
+            item is view.dropzone_item,
+            detail,
+        )
+        recording = self._recordings.get(item)
+        if not recording or recording[0] != state:
+            surface = RecordingSurface(CONTENT_COLOR_ALPHA, None)
+            cr = CairoContext(surface)
+            cr.set_tolerance(cairo.get_tolerance())
+            cr.set_line_join(cairo.get_line_join())
+            # The recording is replayed for other areas as well
+            self._draw_detail(item, cr, None, detail)
+            recording = state, surface
+            self._recordings[item] = recording
+
+        cairo.set_source_surface(recording[1], 0, 0)
+        cairo.paint()
+
     def _draw_items(self, items, cairo, area=None):
         """
         Draw the items.
@@ -155,11 +313,136 @@ class ItemPainter(Painter):
         self._draw_items(context.items, cairo, context.area)
 
 
+class TilePainter(Painter):
+    """
+    Paint items through the tile cache of the view (``View.tile_cache``,
+    see ``gaphas.tiling``). Tiles that are not cached are rendered by
+    ``subpainter``; other tiles are copied from the cache.
+
+    If the view has no tile cache, ``subpainter`` paints the items
+    directly.
+    """
+
+    def __init__(self, subpainter, view=None):
+        super(TilePainter, self).__init__(view)
+        self.subpainter = subpainter
+
+    def set_view(self, view):
+        self.view = view
+        self.subpainter.set_view(view)
+
+    def paint(self, context):
+        view = self.view
+        cache = view.tile_cache
+        if cache is None or context.area is None:
+            self.subpainter.paint(context)
+            return
+
+        # Tiles are aligned with the index space of the view (see
+        # View.scroll()), so they remain valid while scrolling. Only
+        # whole pixels are taken off, so tiles do not need to be
+        # scaled or filtered.
+        ox, oy = view.offset
+        ox, oy = int(floor(ox)), int(floor(oy))
+        matrix = view.matrix.multiply(Matrix(1, 0, 0, 1, -ox, -oy))
+
+        # The view may pass the individual areas to redraw
+        tiles = set()
+        for x, y, w, h in getattr(context, "areas", None) or (context.area,):
+            tiles.update(cache.tiles((x - ox, y - oy, w, h)))
+
+        cairo = context.cairo
+        size = cache.tile_size
+        cairo.save()
+        cairo.identity_matrix()
+        for tx, ty in sorted(tiles):
+            tile_x, tile_y = tx * size + ox, ty * size + oy
+            surface = cache.get(matrix, tx, ty)
+            if surface is None:
+                surface = self._render_tile(tile_x, tile_y, size)
+                cache.put(matrix, tx, ty, surface)
+            cairo.set_source_surface(surface, tile_x, tile_y)
+            cairo.rectangle(tile_x, tile_y, size, size)
+            cairo.fill()
+        cairo.restore()
+
+    def _render_tile(self, x, y, size):
+        """
+        Render the tile at (``x``, ``y``), in view coordinates.
+        """
+        surface = ImageSurface(FORMAT_ARGB32, size, size)
+        surface.set_device_offset(-x, -y)
+        area = Rectangle(x, y, size, size)
+        self.subpainter.paint(
+            Context(
+                cairo=CairoContext(surface),
+                items=self.view.get_items_in_rectangle(area),
+                area=area,
+            )
+        )
+        surface.flush()
+        # The tile is positioned by set_source_surface(), a device
+        # offset would be applied on top of that
+        surface.set_device_offset(0, 0)
+        return surface
+
+
+class HitTestContext(object):
+    """
+    Delegate all calls to the wrapped cairo context, but ignore changes
+    of the source and anti-aliasing, so items are drawn in one solid
+    color.
+    """
+
+    def __init__(self, cairo):
+        self._cairo = cairo
+
+    def __getattr__(self, key):
+        return getattr(self._cairo, key)
+
+    def set_source(self, *args):
+        pass
+
+    set_source_rgb = set_source_rgba = set_source_surface = set_source
+
+    def set_antialias(self, antialias):
+        pass
+
+
+class HitTestPainter(ItemPainter):
+    """
+    Paint items in solid colors that identify the items, for hit
+    testing (see ``gaphas.tiling.HitTestCache``). The n-th item in
+    ``context.items`` is drawn with color value n (0xRRGGBB). Items that
+    do not support pixel hit testing (``Item.pixel_hit_test``) are left
+    out.
+    """
+
+    def paint(self, context):
+        cairo = context.cairo
+        cairo.set_tolerance(TOLERANCE)
+        cairo.set_line_join(LINE_JOIN_ROUND)
+        cairo.set_antialias(ANTIALIAS_NONE)
+        font_options = FontOptions()
+        font_options.set_antialias(ANTIALIAS_NONE)
+        cairo.set_font_options(font_options)
+        for n, item in enumerate(context.items, 1):
+            if item.pixel_hit_test:
+                cairo.set_source_rgb(
+                    (n >> 16 & 0xFF) / 255.0,
+                    (n >> 8 & 0xFF) / 255.0,
+                    (n & 0xFF) / 255.0,
+                )
+                self._draw_item(item, HitTestContext(cairo), context.area)
+
+
 class CairoBoundingBoxContext(object):
     """
     Delegate all calls to the wrapped CairoBoundingBoxContext,
     intercept ``stroke()``, ``fill()`` and a few others so the
     bounding box of the item involved can be calculated.
+
+    The context can be reused for several items, see ``reset()``.
     """
 
     def __init__(self, cairo):
@@ -167,7 +450,12 @@ class CairoBoundingBoxContext(object):
         self._bounds = None  # a Rectangle object
 
     def __getattr__(self, key):
-        return getattr(self._cairo, key)
+        # Bind the method (or value) of the wrapped context, so next
+        # time it is found without calling __getattr__
+        attr = getattr(self._cairo, key)
+        if callable(attr):
+            self.__dict__[key] = attr
+        return attr
 
     def get_bounds(self):
         """
@@ -175,6 +463,12 @@ class CairoBoundingBoxContext(object):
         """
         return self._bounds or Rectangle()
 
+    def reset(self):
+        """
+        Forget the bounding box, to start with the next item.
+        """
+        self._bounds = None
+
     def _update_bounds(self, bounds):
         if bounds:
             if not self._bounds:
@@ -255,24 +549,81 @@ class BoundingBoxPainter(ItemPainter):
     """
     This specific case of an ItemPainter is used to calculate the
     bounding boxes (in canvas coordinates) for the items.
+
+    Items that report their bounds (``Item.bounds()``) are not drawn,
+    unless the cairo context is a wrapper (e.g. of a ``FreeHandPainter``)
+    that may draw outside of those bounds. Bounding boxes are reused
+    until the item is updated by the canvas, or the view is zoomed or
+    rotated.
     """
 
     draw_all = True
 
+    def __init__(self, view=None):
+        super(BoundingBoxPainter, self).__init__(view)
+        # item -> (update generation and scale/rotation of the item to
+        # view matrix, bounding box relative to the item origin)
+        self._bounds = WeakKeyDictionary()
+        # wraps the cairo context of the current paint() call
+        self._bounds_context = None
+
+    def set_view(self, view):
+        super(BoundingBoxPainter, self).set_view(view)
+        self._bounds.clear()
+
     def _draw_item(self, item, cairo, area=None):
-        cairo = CairoBoundingBoxContext(cairo)
-        super(BoundingBoxPainter, self)._draw_item(item, cairo)
-        bounds = cairo.get_bounds()
+        view = self.view
+        i2v = view.get_matrix_i2v(item)
+        xx, yx, xy, yy, x0, y0 = i2v
+        key = (item._update_generation, xx, yx, xy, yy)
+
+        cached = self._bounds.get(item)
+        if cached and cached[0] == key:
+            x, y, w, h = cached[1]
+            bounds = Rectangle(x + x0, y + y0, w, h)
+        else:
+            bounds = self._item_bounds(item, i2v, cairo)
+            x, y, w, h = bounds
+            self._bounds[item] = key, (x - x0, y - y0, w, h)
+        view.set_item_bounding_box(item, bounds)
+
+    def _item_bounds(self, item, i2v, cairo):
+        """
+        Calculate the bounding box of ``item``, in view coordinates.
+        """
+        # Wrappers, such as the FreeHandCairoContext, do not draw exactly
+        # what the item asks for
+        if isinstance(cairo, CairoContext):
+            item_bounds = item.bounds()
+        else:
+            item_bounds = None
+        if item_bounds is None:
+            bounds_context = self._bounds_context
+            if bounds_context is None or bounds_context._cairo is not cairo:
+                bounds_context = CairoBoundingBoxContext(cairo)
+            bounds_context.reset()
+            super(BoundingBoxPainter, self)._draw_item(item, bounds_context)
+            bounds = bounds_context.get_bounds()
+        else:
+            x, y, w, h = item_bounds
+            xs, ys = list(
+                zip(
+                    *[
+                        i2v.transform_point(px, py)
+                        for px, py in ((x, y), (x + w, y), (x, y + h), (x + w, y + h))
+                    ]
+                )
+            )
+            bounds = Rectangle(min(xs), min(ys), x1=max(xs), y1=max(ys))
 
         # Update bounding box with handles.
-        view = self.view
-        i2v = view.get_matrix_i2v(item).transform_point
+        transform_point = i2v.transform_point
         for h in item.handles():
-            cx, cy = i2v(*h.pos)
+            cx, cy = transform_point(*h.pos)
             bounds += (cx - 5, cy - 5, 9, 9)
 
         bounds.expand(1)
-        view.set_item_bounding_box(item, bounds)
+        return bounds
 
     def _draw_items(self, items, cairo, area=None):
         """
@@ -282,7 +633,12 @@ class BoundingBoxPainter(ItemPainter):
             self._draw_item(item, cairo)
 
     def paint(self, context):
-        self._draw_items(context.items, context.cairo)
+        cairo = context.cairo
+        self._bounds_context = CairoBoundingBoxContext(cairo)
+        try:
+            self._draw_items(context.items, cairo)
+        finally:
+            self._bounds_context = None
 
 
 class HandlePainter(Painter):
@@ -341,7 +697,9 @@ class HandlePainter(Painter):
         cairo = context.cairo
         # Order matters here:
         for item in canvas.sort(view.selected_items):
-            self._draw_handles(item, cairo)
+            # No handles for items that are drawn as a proxy
+            if not _level_of_detail(view, item)[1]:
+                self._draw_handles(item, cairo)
         # Draw nice opaque handles when hovering an item:
         item = view.hovered_item
         if item and item not in view.selected_items:
@@ -383,10 +741,11 @@ class FocusedItemPainter(Painter):
 def DefaultPainter(view=None):
     """
     Default painter, containing item, handle and tool painters.
+    Items are painted through the tile cache of the view, if it has one.
     """
     return (
         PainterChain(view)
-        .append(ItemPainter())
+        .append(TilePainter(ItemPainter()))
         .append(HandlePainter())
         .append(FocusedItemPainter())
         .append(ToolPainter())
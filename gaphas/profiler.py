@@ -0,0 +1,204 @@
+"""
+Find out where the time goes when a view is painted.
+
+A ``PainterProfiler`` measures a painter, for example the painter of a
+view::
+
+    profiler = PainterProfiler(view.painter, frames=60, callback=print)
+    profiler.start()
+
+Every time the painter paints counts as one frame. The time spent in
+every painter of a ``PainterChain`` is measured, and the time spent
+drawing items, per item class, in every ``ItemPainter``.
+
+The painters are only instrumented between ``start()`` and ``stop()``,
+so a profiler that is not started costs nothing.
+"""
+from __future__ import absolute_import
+from __future__ import division
+
+from builtins import object
+from collections import namedtuple
+from timeit import default_timer
+
+from .painter import ItemPainter
+
+
+class PaintReport(namedtuple("PaintReport", "frames total painters items")):
+    """
+    Timings of ``frames`` frames, in seconds:
+
+    - total: time spent painting
+    - painters: list of (painter, time) tuples, in paint order
+    - items: list of (item class, number of items drawn, time) tuples,
+      most time first
+
+    >>> class Box(object): pass
+    >>> print(PaintReport(2, 0.004, [("ItemPainter", 0.003)], [(Box, 10, 0.002)]))
+    2 frames, 2.000 ms per frame
+      ItemPainter  1.500 ms
+      Box          1.000 ms  (5 per frame)
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        frames = self.frames or 1
+        names = [str(p) for p, t in self.painters] + [
+            c.__name__ for c, n, t in self.items
+        ]
+        width = max([len(n) for n in names] + [0])
+        lines = [
+            "%d frames, %.3f ms per frame" % (self.frames, self.total * 1000 / frames)
+        ]
+        for painter, t in self.painters:
+            lines.append("  %-*s  %.3f ms" % (width, painter, t * 1000 / frames))
+        for cls, n, t in self.items:
+            lines.append(
+                "  %-*s  %.3f ms  (%d per frame)"
+                % (width, cls.__name__, t * 1000 / frames, n // frames)
+            )
+        return "\n".join(lines)
+
+
+class PainterProfiler(object):
+    """
+    Measure the time spent by ``painter``, the painters it is made of and
+    the items it draws.
+
+    If ``frames`` and ``callback`` are provided, ``callback(report)`` is
+    called every ``frames`` frames, with a ``PaintReport``. The timings
+    are reset after that.
+    """
+
+    def __init__(self, painter, frames=0, callback=None):
+        self.painter = painter
+        self.frames = frames
+        self.callback = callback
+
+        # (painter, attribute name, overridden instance attribute)
+        self._patched = []
+        self.reset()
+
+    running = property(lambda s: bool(s._patched), doc="The profiler is started")
+
+    def reset(self):
+        """
+        Reset the timings.
+        """
+        self._frames = 0
+        self._total = 0.0
+        # painter -> time
+        self._painter_times = {}
+        # item class -> [number of items, time]
+        self._item_times = {}
+
+    def start(self):
+        """
+        Instrument the painters.
+        """
+        if self._patched:
+            return
+        painter = self.painter
+        self._patch(painter, "paint", self._timed_frame(painter.paint))
+        for p in getattr(painter, "_painters", ()):
+            self._patch(p, "paint", self._timed_paint(p, p.paint))
+        for p in _walk(painter):
+            if isinstance(p, ItemPainter):
+                self._patch(p, "_draw_item", self._timed_draw_item(p._draw_item))
+
+    def stop(self):
+        """
+        Restore the painters.
+        """
+        while self._patched:
+            painter, name, previous = self._patched.pop()
+            if previous is None:
+                delattr(painter, name)
+            else:
+                setattr(painter, name, previous)
+
+    def report(self):
+        """
+        Return a ``PaintReport`` of the timings so far.
+        """
+        painter = self.painter
+        if hasattr(painter, "_painters"):
+            times = self._painter_times
+            painters = [
+                (type(p).__name__, times.get(p, 0.0)) for p in painter._painters
+            ]
+        else:
+            painters = [(type(painter).__name__, self._total)]
+        return PaintReport(
+            frames=self._frames,
+            total=self._total,
+            painters=painters,
+            items=sorted(
+                [(cls, n, t) for cls, (n, t) in self._item_times.items()],
+                key=lambda i: -i[2],
+            ),
+        )
+
+    def _patch(self, painter, name, func):
+        self._patched.append((painter, name, painter.__dict__.get(name)))
+        setattr(painter, name, func)
+
+    def _timed_frame(self, paint):
+        def timed_paint(context):
+            t = default_timer()
+            try:
+                paint(context)
+            finally:
+                self._total += default_timer() - t
+                self._frames += 1
+            if self.callback and self.frames and self._frames >= self.frames:
+                report = self.report()
+                self.reset()
+                self.callback(report)
+
+        return timed_paint
+
+    def _timed_paint(self, painter, paint):
+        def timed_paint(context):
+            t = default_timer()
+            try:
+                paint(context)
+            finally:
+                times = self._painter_times
+                times[painter] = times.get(painter, 0.0) + default_timer() - t
+
+        return timed_paint
+
+    def _timed_draw_item(self, draw_item):
+        def timed_draw_item(item, cairo, area=None):
+            t = default_timer()
+            try:
+                draw_item(item, cairo, area)
+            finally:
+                t = default_timer() - t
+                try:
+                    times = self._item_times[type(item)]
+                except KeyError:
+                    times = self._item_times[type(item)] = [0, 0.0]
+                times[0] += 1
+                times[1] += t
+
+        return timed_draw_item
+
+
+def _walk(painter):
+    """
+    Iterate ``painter`` and the painters it delegates to.
+    """
+    yield painter
+    for p in getattr(painter, "_painters", ()):
+        for sub in _walk(p):
+            yield sub
+    subpainter = getattr(painter, "subpainter", None)
+    if subpainter is not None:
+        for sub in _walk(subpainter):
+            yield sub
+
+
+# vim:sw=4:et:ai
@@ -16,18 +16,50 @@ as a Q-tree. All forms of Quadtrees share some common features:
 * The tree directory follows the spatial decomposition of the Quadtree.
 
 (From Wikipedia, the free encyclopedia)
+
+In Gaphas buckets split lazily, the first time an over-full bucket is
+queried, and are merged again when removals leave them under-full.
 """
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import itertools
 import operator
+import sys
 from builtins import map
 from builtins import object
 from builtins import zip
+from collections import namedtuple
+from heapq import heappush, heappop
+from math import sqrt
 
 from .geometry import rectangle_contains, rectangle_intersects, rectangle_clip
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Buckets are scanned with NumPy (if available) when the number of
+# (item, rectangle) pairs to test in one bucket exceeds this value.
+NUMPY_SCAN_THRESHOLD = 64
+
+# Over-full buckets are not split beyond this depth. This protects the
+# tree from items that share the same position.
+MAX_DEPTH = 32
+
+# Clipped bounds (x + width) may exceed the edges of the tree by a
+# rounding error. Buckets allow this much (relative) slack.
+EDGE_EPSILON = 1e-9
+
+# Kinds of entries in the find_nearest() queue
+_BUCKET, _ITEM, _FOUND = range(3)
+
+QuadtreeStats = namedtuple(
+    "QuadtreeStats", "items buckets depth max_bucket_items memory"
+)
+
 
 class Quadtree(object):
     """
@@ -40,6 +72,11 @@ class Quadtree(object):
     ...     qtree.add('%d' % i, ((i * 4) % 90, (i * 10) % 90, 10, 10))
     >>> len(qtree)
     20
+
+    Buckets are split the first time the tree is queried:
+
+    >>> len(qtree.find_intersect((0, 0, 100, 100)))
+    20
     >>> qtree.dump() # doctest: +ELLIPSIS +NORMALIZE_WHITESPACE
      <....QuadtreeBucket object at 0x...> (0, 0, 100, 100)
        11 (44, 20, 10, 10)
@@ -96,20 +133,76 @@ class Quadtree(object):
         Capacity defines the number of elements in one tree bucket (default: 10)
         """
         self._capacity = capacity
+        self._bounds = bounds
         self._bucket = QuadtreeBucket(bounds, capacity)
 
         # Easy lookup item->(bounds, data, clipped bounds) mapping
         self._ids = dict()
 
-    bounds = property(lambda s: s._bucket.bounds)
+        # Items that are partly (_clipped) or entirely (_outside) outside
+        # the tree bounds
+        self._clipped = set()
+        self._outside = set()
+
+    bounds = property(lambda s: s._bounds)
 
     def resize(self, bounds):
         """
         Resize the tree.
-        The tree structure is rebuild.
-        """
-        self._bucket = QuadtreeBucket(bounds, self._capacity)
-        self.rebuild()
+
+        The tree structure is not rebuild. The root bucket grows (or
+        shrinks) to cover the new bounds, and only items that are clipped
+        by either the old or the new bounds are placed again.
+
+        >>> qtree = Quadtree((0, 0, 100, 100))
+        >>> qtree.add('a', (10, 10, 10, 10))
+        >>> qtree.add('b', (90, 90, 20, 20))
+        >>> qtree.get_clipped_bounds('b')
+        (90, 90, 10, 10)
+        >>> qtree.resize((0, 0, 200, 200))
+        >>> qtree.get_clipped_bounds('b')
+        (90, 90, 20, 20)
+        >>> qtree.resize((0, 0, 50, 50))
+        >>> qtree.get_clipped_bounds('b')
+        >>> sorted(qtree.find_intersect((0, 0, 200, 200)))
+        ['a']
+        """
+        old_bounds = self._bounds
+        if tuple(bounds) == tuple(old_bounds):
+            return
+        self._bounds = bounds
+
+        root = self._bucket
+        x, y, w, h = root.bounds
+        if not root.count or w <= 0 or h <= 0:
+            # Nothing worth preserving
+            self.rebuild()
+            return
+
+        while not root.covers(bounds):
+            root = root.grow(bounds)
+        self._bucket = root
+
+        # Items that were clipped, are in the area that is dropped, or are
+        # in the area that is added need to be placed again
+        affected = set(self._clipped)
+        strips = _outside_strips(old_bounds, bounds)
+        if strips:
+            affected.update(*self._find_many(strips, rectangle_intersects))
+        if _outside_strips(bounds, old_bounds):
+            get_bounds = self.get_bounds
+            affected.update(
+                item
+                for item in self._outside
+                if rectangle_intersects(get_bounds(item), bounds)
+            )
+        for item in affected:
+            item_bounds, data, _ = self._ids[item]
+            self.add(item, item_bounds, data)
+
+        root = self._bucket.shrink(bounds)
+        root.parent = None
+        self._bucket = root
 
     def get_soft_bounds(self):
         """
@@ -162,7 +255,7 @@ class Quadtree(object):
         """
         # Clip item bounds to fit in top-level bucket
         # Keep original bounds in _ids, for reference
-        clipped_bounds = rectangle_clip(bounds, self._bucket.bounds)
+        clipped_bounds = rectangle_clip(bounds, self._bounds)
 
         if item in self._ids:
             old_clip = self._ids[item][2]
@@ -170,28 +263,40 @@ class Quadtree(object):
                 bucket = self._bucket.find_bucket(old_clip)
                 assert item in bucket.items
                 # Fast lane, if item moved just a little it may still reside
-                # in the same bucket. We do not need to search from top-level.
+                # in the same bucket. Items on the edge of a bucket may be
+                # covered by it, yet belong to a neighbour.
                 if (
-                    bucket
-                    and clipped_bounds
-                    and rectangle_contains(clipped_bounds, bucket.bounds)
+                    clipped_bounds
+                    and self._bucket.find_bucket(clipped_bounds) is bucket
                 ):
                     bucket.update(item, clipped_bounds)
-                    self._ids[item] = (bounds, data, clipped_bounds)
+                    self._set_ids(item, bounds, data, clipped_bounds)
                     return
-                elif bucket:
-                    bucket.remove(item)
+                bucket.remove(item)
 
         if clipped_bounds:
             self._bucket.find_bucket(clipped_bounds).add(item, clipped_bounds)
+        self._set_ids(item, bounds, data, clipped_bounds)
+
+    def _set_ids(self, item, bounds, data, clipped_bounds):
         self._ids[item] = (bounds, data, clipped_bounds)
+        if not clipped_bounds:
+            self._clipped.discard(item)
+            self._outside.add(item)
+        elif clipped_bounds == tuple(bounds):
+            self._clipped.discard(item)
+            self._outside.discard(item)
+        else:
+            self._clipped.add(item)
+            self._outside.discard(item)
 
     def remove(self, item):
         """
         Remove an item from the tree.
         """
-        bounds, data, clipped_bounds = self._ids[item]
-        del self._ids[item]
+        bounds, data, clipped_bounds = self._ids.pop(item)
+        self._clipped.discard(item)
+        self._outside.discard(item)
         if clipped_bounds:
             self._bucket.find_bucket(clipped_bounds).remove(item)
 
@@ -201,19 +306,23 @@ class Quadtree(object):
         """
         self._bucket.clear()
         self._ids.clear()
+        self._clipped.clear()
+        self._outside.clear()
 
     def rebuild(self):
         """
         Rebuild the tree structure.
         """
         # Clean bucket and items:
-        self._bucket.clear()
+        self._bucket = QuadtreeBucket(self._bounds, self._capacity)
+        self._clipped.clear()
+        self._outside.clear()
 
         for item, (bounds, data, _) in list(dict(self._ids).items()):
-            clipped_bounds = rectangle_clip(bounds, self._bucket.bounds)
+            clipped_bounds = rectangle_clip(bounds, self._bounds)
             if clipped_bounds:
                 self._bucket.find_bucket(clipped_bounds).add(item, clipped_bounds)
-            self._ids[item] = (bounds, data, clipped_bounds)
+            self._set_ids(item, bounds, data, clipped_bounds)
 
     def get_bounds(self, item):
         """
@@ -250,6 +359,129 @@ class Quadtree(object):
         """
         return set(self._bucket.find(rect, method=rectangle_intersects))
 
+    def find_inside_many(self, rects):
+        """
+        Find all items inside each of the given rectangles. The tree is
+        traversed only once.
+
+        Returns a list of sets, one for each rectangle.
+
+        >>> qtree = Quadtree((0, 0, 100, 100))
+        >>> qtree.add('a', (10, 10, 10, 10))
+        >>> qtree.add('b', (60, 60, 10, 10))
+        >>> [sorted(s) for s in qtree.find_inside_many([(0, 0, 50, 50), (0, 0, 15, 15)])]
+        [['a'], []]
+        """
+        return self._find_many(rects, method=rectangle_contains)
+
+    def find_intersect_many(self, rects):
+        """
+        Find all items that intersect with each of the given rectangles.
+        The tree is traversed only once.
+
+        Returns a list of sets, one for each rectangle.
+
+        >>> qtree = Quadtree((0, 0, 100, 100))
+        >>> qtree.add('a', (10, 10, 10, 10))
+        >>> qtree.add('b', (60, 60, 10, 10))
+        >>> [sorted(s) for s in qtree.find_intersect_many([(0, 0, 50, 50), (15, 15, 50, 50)])]
+        [['a'], ['a', 'b']]
+        """
+        return self._find_many(rects, method=rectangle_intersects)
+
+    def find_nearest(self, point, k=1, max_distance=None, distance=None):
+        """
+        Find the ``k`` items closest to ``point`` (x, y). If ``k`` is
+        None, all items within ``max_distance`` are returned.
+
+        By default the distance to the (clipped) bounding box of an item
+        is used. A function ``distance(item)`` can be provided to
+        calculate the true distance. It should never return a value
+        smaller than the distance to the bounding box. If it returns
+        None, the item is skipped.
+
+        Returns a list of (item, distance) tuples, closest first.
+
+        >>> qtree = Quadtree((0, 0, 100, 100))
+        >>> qtree.add('a', (10, 10, 10, 10))
+        >>> qtree.add('b', (50, 10, 10, 10))
+        >>> qtree.add('c', (80, 80, 10, 10))
+        >>> qtree.find_nearest((30, 15), k=2)
+        [('a', 10.0), ('b', 20.0)]
+        >>> qtree.find_nearest((30, 15), max_distance=5)
+        []
+        >>> qtree.find_nearest((30, 15), distance=lambda item: 100 if item == 'a' else None)
+        [('a', 100)]
+        """
+        px, py = point
+        counter = itertools.count()
+        root = self._bucket
+        heap = [(root.distance(px, py), next(counter), _BUCKET, root)]
+        found = []
+        while heap and (k is None or len(found) < k):
+            d, _, kind, obj = heappop(heap)
+            if max_distance is not None and d > max_distance:
+                break
+            if kind == _BUCKET:
+                obj._split_overfull()
+                for item, bounds in obj.items.items():
+                    d = _distance_rectangle_point(bounds, px, py)
+                    if max_distance is None or d <= max_distance:
+                        heappush(heap, (d, next(counter), _ITEM, item))
+                for bucket in obj._buckets:
+                    d = bucket.distance(px, py)
+                    if max_distance is None or d <= max_distance:
+                        heappush(heap, (d, next(counter), _BUCKET, bucket))
+            elif kind == _ITEM and distance:
+                d = distance(obj)
+                if d is not None:
+                    heappush(heap, (d, next(counter), _FOUND, obj))
+            else:
+                found.append((obj, d))
+        return found
+
+    def _find_many(self, rects, method):
+        rects = [tuple(r) for r in rects]
+        found = [set() for r in rects]
+        if rects:
+            self._bucket.find_many(rects, list(range(len(rects))), found, method)
+        return found
+
+    def get_stats(self):
+        """
+        Return statistics about the tree structure as a QuadtreeStats
+        tuple: the number of items, the number of buckets, the depth of
+        the tree, the largest number of items held by one bucket and an
+        estimate of the memory used by the index, in bytes.
+
+        >>> qtree = Quadtree((0, 0, 100, 100), capacity=2)
+        >>> for i in range(4):
+        ...     qtree.add(i, (i * 20, i * 20, 10, 10))
+        >>> qtree.get_stats()[:4]
+        (4, 1, 1, 4)
+        >>> len(qtree.find_intersect((0, 0, 100, 100)))
+        4
+        >>> qtree.get_stats()[:4]
+        (4, 9, 3, 1)
+        """
+        getsizeof = sys.getsizeof
+        buckets = depth = max_items = 0
+        memory = sum(map(getsizeof, (self._ids, self._clipped, self._outside)))
+        memory += sum(map(getsizeof, self._ids.values()))
+        stack = [(self._bucket, 1)]
+        while stack:
+            bucket, level = stack.pop()
+            buckets += 1
+            depth = max(depth, level)
+            max_items = max(max_items, len(bucket.items))
+            memory += (
+                getsizeof(bucket) + getsizeof(bucket.items) + getsizeof(bucket._buckets)
+            )
+            if bucket._array is not None:
+                memory += bucket._array[1].nbytes
+            stack.extend((b, level + 1) for b in bucket._buckets)
+        return QuadtreeStats(len(self._ids), buckets, depth, max_items, memory)
+
     def __len__(self):
         """
         Return number of items in tree.
@@ -269,54 +501,115 @@ class Quadtree(object):
         self._bucket.dump()
 
 
+def _distance_rectangle_point(rect, px, py):
+    """
+    Return the euclidean distance from point (px, py) to ``rect``.
+
+    >>> _distance_rectangle_point((0, 0, 10, 10), 13, 14)
+    5.0
+    """
+    x, y, w, h = rect
+    dx = max(x - px, 0, px - x - w)
+    dy = max(y - py, 0, py - y - h)
+    return sqrt(dx * dx + dy * dy)
+
+
+def _edge_bucket(edges, capacity, parent=None):
+    """
+    Create a bucket from its edges (x0, y0, x1, y1).
+    """
+    x0, y0, x1, y1 = edges
+    bucket = QuadtreeBucket((x0, y0, x1 - x0, y1 - y0), capacity, parent)
+    bucket.edges = edges
+    return bucket
+
+
+def _outside_strips(rect, bounds):
+    """
+    Return the parts of ``rect`` that are not covered by ``bounds``, as a
+    list of at most four rectangles.
+
+    >>> _outside_strips((0, 0, 100, 100), (0, 0, 50, 100))
+    [(50, 0, 50, 100)]
+    >>> _outside_strips((0, 0, 100, 100), (0, 0, 200, 200))
+    []
+    """
+    x, y, w, h = rect
+    x1, y1 = x + w, y + h
+    bx, by, bw, bh = bounds
+    bx1, by1 = bx + bw, by + bh
+    if bx >= x1 or bx1 <= x or by >= y1 or by1 <= y:
+        return [(x, y, w, h)] if w > 0 and h > 0 else []
+    strips = []
+    if by > y:
+        strips.append((x, y, w, by - y))
+    if by1 < y1:
+        strips.append((x, by1, w, y1 - by1))
+    top, bottom = max(y, by), min(y1, by1)
+    if bx > x:
+        strips.append((x, top, bx - x, bottom - top))
+    if bx1 < x1:
+        strips.append((bx1, top, x1 - bx1, bottom - top))
+    return strips
+
+
 class QuadtreeBucket(object):
     """
     A node in a Quadtree structure.
     """
 
-    def __init__(self, bounds, capacity):
+    def __init__(self, bounds, capacity, parent=None):
         """
         Set bounding box for the node as (x, y, width, height).
         """
         self.bounds = bounds
         self.capacity = capacity
+        self.parent = parent
+
+        # Edges (x0, y0, x1, y1). Adjacent buckets share the exact same
+        # edge values, which are used to place and find items.
+        x, y, w, h = bounds
+        self.edges = (x, y, x + w, y + h)
 
         self.items = {}
         self._buckets = []
 
+        # Number of items in this bucket and its sub-buckets
+        self.count = 0
+
+        # Cached (keys, bounds array) for NumPy bucket scans
+        self._array = None
+
     def add(self, item, bounds):
         """
         Add an item to the quadtree.
-        The bucket is split when nessecary.
-        Items are otherwise added to this bucket, not some sub-bucket.
-        """
-        assert rectangle_contains(bounds, self.bounds)
-        # create new subnodes if threshold is reached
-        if not self._buckets and len(self.items) >= self.capacity:
-            x, y, w, h = self.bounds
-            rw, rh = w / 2.0, h / 2.0
-            cx, cy = x + rw, y + rh
-            self._buckets = [
-                QuadtreeBucket((x, y, rw, rh), self.capacity),
-                QuadtreeBucket((cx, y, rw, rh), self.capacity),
-                QuadtreeBucket((x, cy, rw, rh), self.capacity),
-                QuadtreeBucket((cx, cy, rw, rh), self.capacity),
-            ]
-            # Add items to subnodes
-            items = list(self.items.items())
-            self.items.clear()
-            for i, b in items:
-                self.find_bucket(b).add(i, b)
-            self.find_bucket(bounds).add(item, bounds)
-        else:
-            self.items[item] = bounds
+        Items are added to this bucket, not some sub-bucket. A bucket
+        that exceeds its capacity is split the next time it is queried.
+        """
+        assert self.covers(bounds)
+        self.items[item] = bounds
+        self._array = None
+        bucket = self
+        while bucket is not None:
+            bucket.count += 1
+            bucket = bucket.parent
 
     def remove(self, item):
         """
         Remove an item from the quadtree bucket.
         The item should be contained by *this* bucket (not a sub-bucket).
+        Sub-trees that become under-full are merged.
         """
+        self._remove(item)
+        self._merge()
+
+    def _remove(self, item):
         del self.items[item]
+        self._array = None
+        bucket = self
+        while bucket is not None:
+            bucket.count -= 1
+            bucket = bucket.parent
 
     def update(self, item, new_bounds):
         """
@@ -325,9 +618,169 @@ class QuadtreeBucket(object):
         sub-bucket.
         """
         assert item in self.items
-        self.remove(item)
+        self._remove(item)
         self.find_bucket(new_bounds).add(item, new_bounds)
 
+    def _split(self):
+        """
+        Create sub-buckets and move the items that fit into them.
+        """
+        x0, y0, x1, y1 = self.edges
+        x, y, w, h = self.bounds
+        self._set_buckets((x0, x + w / 2.0, x1), (y0, y + h / 2.0, y1))
+        items = list(self.items.items())
+        self.items.clear()
+        self._array = None
+        for i, b in items:
+            bucket = self.find_bucket(b)
+            bucket.items[i] = b
+            if bucket is not self:
+                bucket.count += 1
+
+    def _split_overfull(self):
+        """
+        Split the bucket if it holds more items than its capacity.
+        """
+        if self._buckets or len(self.items) <= self.capacity:
+            return
+        depth = 0
+        bucket = self.parent
+        while bucket is not None:
+            depth += 1
+            bucket = bucket.parent
+        if depth < MAX_DEPTH:
+            self._split()
+
+    def _merge(self):
+        """
+        Collapse the topmost (parent) bucket that holds too few items to
+        justify its sub-buckets.
+        """
+        threshold = self.capacity // 2
+        target = None
+        bucket = self
+        while bucket is not None:
+            if bucket._buckets and bucket.count <= threshold:
+                target = bucket
+            bucket = bucket.parent
+        if target is not None:
+            target.collapse()
+
+    def collapse(self):
+        """
+        Move the items of all sub-buckets into this bucket and remove the
+        sub-buckets.
+        """
+        buckets = list(self._buckets)
+        while buckets:
+            bucket = buckets.pop()
+            self.items.update(bucket.items)
+            buckets.extend(bucket._buckets)
+        del self._buckets[:]
+        self._array = None
+
+    def grow(self, bounds):
+        """
+        Return a new bucket, twice the size of this one, that holds this
+        bucket as one of its quadrants. The new bucket extends in the
+        direction of ``bounds``.
+        """
+        x0, y0, x1, y1 = self.edges
+        w, h = x1 - x0, y1 - y0
+        xs = (x0 - w, x0, x1) if bounds[0] < x0 else (x0, x1, x1 + w)
+        ys = (y0 - h, y0, y1) if bounds[1] < y0 else (y0, y1, y1 + h)
+        parent = _edge_bucket((xs[0], ys[0], xs[2], ys[2]), self.capacity)
+        parent._set_buckets(xs, ys)
+        parent._buckets[xs.index(x0) + 2 * ys.index(y0)] = self
+        parent.count = self.count
+        self.parent = parent
+
+        # Items on the right or bottom edge (or just over it, see
+        # covers()) are routed to the new quadrants by find_bucket()
+        for bucket, item, b in self._edge_items(xs[1] == x1, ys[1] == y1):
+            bucket._remove(item)
+            parent.find_bucket(b).add(item, b)
+        return parent
+
+    def _edge_items(self, right, bottom):
+        """
+        Return (bucket, item, bounds) for the items in this (sub-)tree
+        that touch the right (if ``right``) or bottom (if ``bottom``)
+        edge from outside.
+        """
+        if not (right or bottom):
+            return []
+        x1, y1 = self.edges[2:]
+        found = []
+        buckets = [self]
+        while buckets:
+            bucket = buckets.pop()
+            for item, (x, y, w, h) in bucket.items.items():
+                if (right and (x >= x1 or x + w > x1)) or (
+                    bottom and (y >= y1 or y + h > y1)
+                ):
+                    found.append((bucket, item, (x, y, w, h)))
+            buckets.extend(
+                b
+                for b in bucket._buckets
+                if (right and b.edges[2] == x1) or (bottom and b.edges[3] == y1)
+            )
+        return found
+
+    def shrink(self, bounds):
+        """
+        Return the smallest bucket in this (sub-)tree that still covers
+        ``bounds`` and holds all items.
+        """
+        bucket = self
+        while bucket._buckets and not bucket.items:
+            filled = [b for b in bucket._buckets if b.count]
+            if len(filled) != 1 or not filled[0].covers(bounds):
+                break
+            bucket = filled[0]
+        return bucket
+
+    def _set_buckets(self, xs, ys):
+        """
+        Create sub-buckets, with edges ``xs`` and ``ys`` (both a tuple of
+        start, center and end).
+        """
+        self._buckets = [
+            _edge_bucket((xs[i], ys[j], xs[i + 1], ys[j + 1]), self.capacity, self)
+            for j in (0, 1)
+            for i in (0, 1)
+        ]
+
+    def covers(self, bounds):
+        """
+        Return True if the rectangle ``bounds`` fits within this bucket.
+        """
+        x, y, w, h = bounds
+        x0, y0, x1, y1 = self.edges
+        return (
+            x >= x0
+            and y >= y0
+            and x + w <= x1 + EDGE_EPSILON * (abs(x1) + 1)
+            and y + h <= y1 + EDGE_EPSILON * (abs(y1) + 1)
+        )
+
+    def intersects(self, rect):
+        """
+        Return True if the rectangle ``rect`` intersects with this bucket.
+        """
+        x, y, w, h = rect
+        x0, y0, x1, y1 = self.edges
+        return x <= x1 and x + w >= x0 and y <= y1 and y + h >= y0
+
+    def distance(self, px, py):
+        """
+        Return the distance from point (px, py) to this bucket.
+        """
+        x0, y0, x1, y1 = self.edges
+        dx = max(x0 - px, 0, px - x1)
+        dy = max(y0 - py, 0, py - y1)
+        return sqrt(dx * dx + dy * dy)
+
     def find_bucket(self, bounds):
         """
         Find the bucket that holds a bounding box.
@@ -336,8 +789,8 @@ class QuadtreeBucket(object):
         add() or remove() is called.
         """
         if self._buckets:
-            sx, sy, sw, sh = self.bounds
-            cx, cy = sx + sw / 2.0, sy + sh / 2.0
+            cx = self._buckets[1].edges[0]
+            cy = self._buckets[2].edges[1]
             x, y, w, h = bounds
             index = 0
             if x >= cx:
@@ -359,7 +812,8 @@ class QuadtreeBucket(object):
 
         Returns an iterator.
         """
-        if rectangle_intersects(rect, self.bounds):
+        if self.intersects(rect):
+            self._split_overfull()
             for item, bounds in list(self.items.items()):
                 if method(bounds, rect):
                     yield item
@@ -367,12 +821,68 @@ class QuadtreeBucket(object):
                 for item in bucket.find(rect, method=method):
                     yield item
 
+    def find_many(self, rects, indices, found, method):
+        """
+        Find the items for a batch of rectangles in one traversal.
+        Only the rectangles in ``rects`` referred to by ``indices`` are
+        tested. Items matching ``rects[i]`` are added to ``found[i]``.
+        Method can be either the contains or intersects function.
+        """
+        intersects = self.intersects
+        indices = [i for i in indices if intersects(rects[i])]
+        if not indices:
+            return
+
+        self._split_overfull()
+        items = self.items
+        if items:
+            if numpy is not None and len(items) * len(indices) >= NUMPY_SCAN_THRESHOLD:
+                self._scan_array(rects, indices, found, method)
+            else:
+                for item, b in items.items():
+                    for i in indices:
+                        if method(b, rects[i]):
+                            found[i].add(item)
+        for bucket in self._buckets:
+            bucket.find_many(rects, indices, found, method)
+
+    def _scan_array(self, rects, indices, found, method):
+        """
+        Test all items in this bucket against the rectangles at once,
+        using NumPy.
+        """
+        if self._array is None:
+            keys = list(self.items.keys())
+            b = numpy.array([self.items[k] for k in keys], dtype=float)
+            b[:, 2] += b[:, 0]
+            b[:, 3] += b[:, 1]
+            self._array = keys, b
+        keys, b = self._array
+
+        r = numpy.array([rects[i] for i in indices], dtype=float)
+        rx0, ry0 = r[:, 0], r[:, 1]
+        rx1, ry1 = rx0 + r[:, 2], ry0 + r[:, 3]
+        bx0, by0 = b[:, 0, None], b[:, 1, None]
+        bx1, by1 = b[:, 2, None], b[:, 3, None]
+
+        if method is rectangle_contains:
+            hits = (rx0 <= bx0) & (ry0 <= by0) & (rx1 >= bx1) & (ry1 >= by1)
+        else:
+            hits = (bx0 <= rx1) & (bx1 >= rx0) & (by0 <= ry1) & (by1 >= ry0)
+
+        for column, i in enumerate(indices):
+            rows = numpy.flatnonzero(hits[:, column])
+            if len(rows):
+                found[i].update(keys[k] for k in rows)
+
     def clear(self):
         """
         Clear the bucket, including sub-buckets.
         """
         del self._buckets[:]
         self.items.clear()
+        self.count = 0
+        self._array = None
 
     def dump(self, indent=""):
         print(indent, self, self.bounds)
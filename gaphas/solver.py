@@ -65,6 +65,10 @@ class Variable(object):
 
     """
 
+    # Number of value changes of all variables: values calculated from
+    # variables can be reused as long as it does not change
+    changes = 0
+
     def __init__(self, value=0.0, strength=NORMAL):
         self._value = float(value)
         self._strength = strength
@@ -104,6 +108,7 @@ class Variable(object):
         oldval = self._value
         if abs(oldval - value) > EPSILON:
             self._value = float(value)
+            Variable.changes += 1
             self.dirty()
 
     value = reversible_property(lambda s: s._value, set_value)
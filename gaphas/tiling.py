@@ -0,0 +1,243 @@
+"""
+Caches of rendered tiles.
+
+Views can keep the rendered items in fixed size tiles, so exposes only
+need to composite tiles, instead of drawing all items again. When an
+item changes, only the tiles that overlap with its bounding box are
+invalidated and rendered again.
+
+Tiles are kept per level: the transformation from canvas to tile space.
+Tile (tx, ty) covers the area (tx * size, ty * size, size, size) in tile
+space. When the view is zoomed, a new level is created. The tiles of the
+old level are kept (and kept up to date) as long as the memory budget
+allows, so zooming back does not require rendering everything again.
+
+The same tiling is used for hit testing: ``HitTestCache`` draws tiles
+with the index of the item drawn on each pixel.
+"""
+from __future__ import absolute_import
+from __future__ import division
+
+from builtins import object
+from builtins import range
+from builtins import zip
+from collections import OrderedDict
+from math import floor
+from struct import unpack_from
+
+from cairo import Matrix
+from cairo import Context as CairoContext, ImageSurface, FORMAT_ARGB32
+
+from .canvas import Context
+from .painter import HitTestPainter
+
+
+class TileCache(object):
+    """
+    Cache for rendered tiles (``cairo.ImageSurface`` objects), with LRU
+    eviction once the memory budget ``max_bytes`` is exceeded.
+
+    >>> cache = TileCache(tile_size=100, max_bytes=2 * 1000)
+    >>> level = Matrix()
+    >>> list(cache.tiles((50, 50, 100, 10)))
+    [(0, 0), (1, 0)]
+    >>> cache.put(level, 0, 0, 'a', nbytes=1000)
+    >>> cache.put(level, 1, 0, 'b', nbytes=1000)
+    >>> cache.get(level, 0, 0)
+    'a'
+    >>> cache.put(level, 2, 0, 'c', nbytes=1000)
+    >>> cache.get(level, 1, 0) # least recently used
+    >>> len(cache), cache.nbytes
+    (2, 2000)
+    >>> cache.invalidate((150, 0, 100, 100))
+    >>> cache.get(level, 2, 0)
+    >>> cache.get(level, 0, 0)
+    'a'
+    """
+
+    def __init__(self, tile_size=256, max_bytes=32 * 1024 * 1024):
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+
+        # (level, tx, ty) -> (surface, nbytes), least recently used first
+        self._tiles = OrderedDict()
+
+        # level -> (canvas to tile space matrix, set of (tx, ty))
+        self._levels = {}
+
+        self._nbytes = 0
+
+    nbytes = property(lambda s: s._nbytes, doc="Memory used by the tiles")
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def tiles(self, rect):
+        """
+        Iterate the tile coordinates of the tiles covering ``rect``
+        (x, y, width, height), in tile space.
+        """
+        tx0, ty0, tx1, ty1 = self._tile_range(rect)
+        for ty in range(ty0, ty1 + 1):
+            for tx in range(tx0, tx1 + 1):
+                yield tx, ty
+
+    def get(self, matrix, tx, ty):
+        """
+        Return the tile surface for tile (``tx``, ``ty``) on the level
+        defined by ``matrix``, or None if it is not cached.
+        """
+        key = (tuple(matrix), tx, ty)
+        try:
+            surface, nbytes = self._tiles.pop(key)
+        except KeyError:
+            return None
+        self._tiles[key] = surface, nbytes
+        return surface
+
+    def put(self, matrix, tx, ty, surface, nbytes=None):
+        """
+        Add a rendered tile. ``matrix`` is the canvas to tile space
+        transformation. Least recently used tiles are evicted if the
+        memory budget is exceeded.
+        """
+        if nbytes is None:
+            nbytes = surface.get_stride() * surface.get_height()
+        level = tuple(matrix)
+        key = (level, tx, ty)
+        self._discard(key)
+
+        try:
+            tiles = self._levels[level][1]
+        except KeyError:
+            tiles = set()
+            self._levels[level] = (Matrix(*matrix), tiles)
+        tiles.add((tx, ty))
+        self._tiles[key] = surface, nbytes
+        self._nbytes += nbytes
+
+        while self._nbytes > self.max_bytes and len(self._tiles) > 1:
+            self._discard(next(iter(self._tiles)))
+
+    def invalidate(self, bounds):
+        """
+        Remove all tiles that overlap with ``bounds`` (x, y, width,
+        height), in canvas coordinates, on every level.
+        """
+        x, y, w, h = bounds
+        corners = ((x, y), (x + w, y), (x, y + h), (x + w, y + h))
+        for level, (matrix, tiles) in list(self._levels.items()):
+            transform_point = matrix.transform_point
+            xs, ys = list(zip(*[transform_point(*c) for c in corners]))
+            # Include anti-aliased pixels on the tile edges
+            x0, y0 = min(xs) - 1, min(ys) - 1
+            rect = (x0, y0, max(xs) + 1 - x0, max(ys) + 1 - y0)
+            tx0, ty0, tx1, ty1 = self._tile_range(rect)
+            for tx, ty in list(tiles):
+                if tx0 <= tx <= tx1 and ty0 <= ty <= ty1:
+                    self._discard((level, tx, ty))
+
+    def clear(self):
+        """
+        Remove all tiles.
+        """
+        self._tiles.clear()
+        self._levels.clear()
+        self._nbytes = 0
+
+    def _tile_range(self, rect):
+        """
+        Return the first and last tile (tx0, ty0, tx1, ty1) covering
+        ``rect``.
+        """
+        size = self.tile_size
+        x, y, w, h = rect
+        tx0, ty0 = int(floor(x / size)), int(floor(y / size))
+        tx1, ty1 = int(floor((x + w) / size)), int(floor((y + h) / size))
+        if w > 0 and (x + w) % size == 0:
+            tx1 -= 1
+        if h > 0 and (y + h) % size == 0:
+            ty1 -= 1
+        return tx0, ty0, tx1, ty1
+
+    def _discard(self, key):
+        try:
+            surface, nbytes = self._tiles.pop(key)
+        except KeyError:
+            return
+        self._nbytes -= nbytes
+        level, tx, ty = key
+        tiles = self._levels[level][1]
+        tiles.discard((tx, ty))
+        if not tiles:
+            del self._levels[level]
+
+
+class HitTestCache(object):
+    """
+    Cached hit testing for a view (``View.hit_test_cache``). Items are
+    drawn, in tiles, on an ID buffer: every pixel holds the index of
+    the topmost item drawn on it. Tiles are drawn when needed and kept
+    in a ``TileCache``.
+    """
+
+    def __init__(self, tile_size=256, max_bytes=4 * 1024 * 1024):
+        self._tiles = TileCache(tile_size, max_bytes)
+
+    def invalidate(self, bounds):
+        """
+        Invalidate the tiles that overlap with ``bounds`` (x, y, width,
+        height), in canvas coordinates.
+        """
+        self._tiles.invalidate(bounds)
+
+    def clear(self):
+        """
+        Remove all tiles.
+        """
+        self._tiles.clear()
+
+    def item_at(self, view, pos):
+        """
+        Return the topmost item drawn at ``pos`` (x, y, in view
+        coordinates), or None. Only items that support pixel hit
+        testing (``Item.pixel_hit_test``) are considered.
+        """
+        ox, oy = view.offset
+        ox, oy = int(floor(ox)), int(floor(oy))
+        matrix = view.matrix.multiply(Matrix(1, 0, 0, 1, -ox, -oy))
+
+        size = self._tiles.tile_size
+        x, y = int(floor(pos[0])) - ox, int(floor(pos[1])) - oy
+        tx, ty = x // size, y // size
+        tile = self._tiles.get(matrix, tx, ty)
+        if tile is None:
+            tile = self._render_tile(view, tx * size + ox, ty * size + oy, size)
+            self._tiles.put(
+                matrix, tx, ty, tile, tile[0].get_stride() * tile[0].get_height()
+            )
+
+        surface, items = tile
+        offset = (y - ty * size) * surface.get_stride() + (x - tx * size) * 4
+        value = unpack_from("=I", surface.get_data(), offset)[0]
+        n = value & 0xFFFFFF
+        # Only opaque pixels are drawn by one item
+        if value >> 24 != 0xFF or not 0 < n <= len(items):
+            return None
+        return items[n - 1]
+
+    def _render_tile(self, view, x, y, size):
+        """
+        Render the ID buffer tile at (``x``, ``y``), in view coordinates.
+        """
+        surface = ImageSurface(FORMAT_ARGB32, size, size)
+        surface.set_device_offset(-x, -y)
+        area = (x, y, size, size)
+        items = view.get_items_in_rectangle(area)
+        painter = HitTestPainter(view)
+        painter.paint(Context(cairo=CairoContext(surface), items=items, area=area))
+        surface.flush()
+        return surface, items
+
+
+# vim:sw=4:et:ai
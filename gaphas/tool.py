@@ -35,12 +35,14 @@ from __future__ import print_function
 
 from builtins import object
 
+from cairo import Matrix
 from gi.repository import Gtk, Gdk
 
 from gaphas.aspect import (
     Finder,
     Selection,
     InMotion,
+    ItemInMotion,
     HandleFinder,
     HandleSelection,
     HandleInMotion,
@@ -144,14 +146,24 @@ class ToolChain(Tool):
     The grabbed item is bypassed in case a double or triple click
     event is received. Should make sure this doesn't end up in
     dangling states.
+
+    Motion events for a grabbed tool (e.g. while dragging) are
+    coalesced: only the latest motion event is passed on, once per
+    frame of the view. Set ``coalesce_motion`` to False to pass on
+    every event.
     """
 
+    coalesce_motion = True
+
     def __init__(self, view=None):
         super(ToolChain, self).__init__(view)
         self._tools = []
         self._grabbed_tool = None
+        self._motion_event = None
+        self._tick_id = None
 
     def set_view(self, view):
+        self._cancel_motion()
         self.view = view
         for tool in self._tools:
             tool.set_view(self.view)
@@ -200,6 +212,12 @@ class ToolChain(Tool):
         """
         handler = self.EVENT_HANDLERS.get(event.type)
 
+        if event.type == Gdk.EventType.MOTION_NOTIFY and self._defer_motion(event):
+            return True
+
+        # Keep the events in order
+        self.flush_motion()
+
         self.validate_grabbed_tool(event)
 
         if self._grabbed_tool and handler:
@@ -219,6 +237,50 @@ class ToolChain(Tool):
                         self.grab(tool)
                     return rt
 
+    def _defer_motion(self, event):
+        """
+        Keep a motion event for a grabbed tool until the next frame.
+        Returns False if the event should be handled right away.
+        """
+        view = self.view
+        if not (
+            self.coalesce_motion
+            and self._grabbed_tool
+            and view
+            and hasattr(view, "add_tick_callback")
+            and view.get_realized()
+        ):
+            return False
+
+        # The event is only valid while it is handled
+        if isinstance(event, Gdk.Event):
+            event = event.copy()
+        self._motion_event = event
+        if self._tick_id is None:
+            self._tick_id = view.add_tick_callback(self._on_tick)
+        return True
+
+    def _on_tick(self, widget, frame_clock):
+        self._tick_id = None
+        self.flush_motion()
+        return False  # remove the tick callback
+
+    def _cancel_motion(self):
+        self._motion_event = None
+        if self._tick_id is not None:
+            self.view.remove_tick_callback(self._tick_id)
+            self._tick_id = None
+
+    def flush_motion(self):
+        """
+        Pass on the motion event that is kept for the next frame, if
+        any.
+        """
+        event = self._motion_event
+        self._cancel_motion()
+        if event is not None and self._grabbed_tool:
+            self._grabbed_tool.handle(event)
+
     def draw(self, context):
         if self._grabbed_tool:
             self._grabbed_tool.draw(context)
@@ -243,12 +305,20 @@ class ItemTool(Tool):
     item gets the focus (e.g. receives key press events).
 
     The roles used are Selection (select, unselect) and InMotion (move).
+    Items with an InMotion aspect that does not override ``move()`` are
+    moved together, with ``Canvas.move_items()``. The aspect of the
+    focused item (or else any of them) snaps the position for all of
+    them (see ``ItemInMotion.snap()``).
     """
 
     def __init__(self, view=None, buttons=(1,)):
         super(ItemTool, self).__init__(view)
         self._buttons = buttons
         self._movable_items = set()
+        # Items moved with Canvas.move_items(), and the other aspects
+        self._group_items = ()
+        self._group_leader = None
+        self._motions = []
 
     def get_item(self):
         return self.view.hovered_item
@@ -303,6 +373,9 @@ class ItemTool(Tool):
         for inmotion in self._movable_items:
             inmotion.stop_move()
         self._movable_items.clear()
+        self._group_items = ()
+        self._group_leader = None
+        del self._motions[:]
         return True
 
     def on_motion_notify(self, event):
@@ -312,16 +385,49 @@ class ItemTool(Tool):
         """
         if event.get_state()[1] & Gdk.EventMask.BUTTON_PRESS_MASK:
 
+            pos = event.get_coords()[1:]
             if not self._movable_items:
                 self._movable_items = set(self.movable_items())
+                group = []
+                self._motions = []
                 for inmotion in self._movable_items:
-                    inmotion.start_move(event.get_coords()[1:])
-
-            for inmotion in self._movable_items:
-                inmotion.move(event.get_coords()[1:])
+                    inmotion.start_move(pos)
+                    if type(inmotion).move == ItemInMotion.move:
+                        group.append(inmotion)
+                    else:
+                        self._motions.append(inmotion)
+                # Kept by the undo system, so do not change it afterwards
+                self._group_items = tuple(inmotion.item for inmotion in group)
+                focused_item = self.view.focused_item
+                for inmotion in group:
+                    self._group_leader = inmotion
+                    if inmotion.item is focused_item:
+                        break
+
+            if self._group_items:
+                self._move_group(pos)
+
+            for inmotion in self._motions:
+                inmotion.move(pos)
 
             return True
 
+    def _move_group(self, pos):
+        """
+        Move the items without a custom InMotion aspect in one batch.
+        """
+        view = self.view
+        leader = self._group_leader
+        x, y = leader.snap(pos)
+        dx, dy = x - leader.last_x, y - leader.last_y
+        if not (dx or dy):
+            return
+        leader.last_x, leader.last_y = x, y
+        v2c = Matrix(*view.matrix)
+        v2c.invert()
+        dx, dy = v2c.transform_distance(dx, dy)
+        view.canvas.move_items(self._group_items, dx, dy)
+
 
 class HandleTool(Tool):
     """
@@ -508,11 +614,7 @@ class PanTool(Tool):
         if event.get_state()[1] & Gdk.ModifierType.BUTTON2_MASK:
             view = self.view
             self.x1, self.y1 = event.get_coords()[1:]
-            dx = self.x1 - self.x0
-            dy = self.y1 - self.y0
-            view._matrix.translate(dx / view._matrix[0], dy / view._matrix[3])
-            # Make sure everything's updated
-            view.request_update((), view._canvas.get_all_items())
+            view.scroll(self.x1 - self.x0, self.y1 - self.y0)
             self.x0 = self.x1
             self.y0 = self.y1
             return True
@@ -524,14 +626,13 @@ class PanTool(Tool):
         view = self.view
         direction = event.get_scroll_direction()[1]
         if direction == Gdk.ScrollDirection.LEFT:
-            view._matrix.translate(self.speed / view._matrix[0], 0)
+            view.scroll(self.speed, 0)
         elif direction == Gdk.ScrollDirection.RIGHT:
-            view._matrix.translate(-self.speed / view._matrix[0], 0)
+            view.scroll(-self.speed, 0)
         elif direction == Gdk.ScrollDirection.UP:
-            view._matrix.translate(0, self.speed / view._matrix[3])
+            view.scroll(0, self.speed)
         elif direction == Gdk.ScrollDirection.DOWN:
-            view._matrix.translate(0, -self.speed / view._matrix[3])
-        view.request_update((), view._canvas.get_all_items())
+            view.scroll(0, -self.speed)
         return True
 
 
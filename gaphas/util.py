@@ -1,35 +1,146 @@
 """Helper functions and classes for Cairo (drawing engine used by the canvas).
 
+Text is measured through ``text_metrics``, a cache of text extents.
 """
 from __future__ import division
 
+from builtins import object
+from collections import OrderedDict
 from math import pi
+from threading import Lock
 
 import cairo
 
 
+class TextMetricsCache(object):
+    """
+    Least recently used cache of text extents, as returned by
+    ``cairo.Context.text_extents()``. It is used by the text helpers in
+    this module.
+
+    Extents are keyed by the text, the font (a font description, as used
+    by ``text_set_font()``, or the font face and size of the cairo
+    context), the font options and the scale of the context. Call
+    ``clear()`` when fonts change in a way that is not part of the key,
+    e.g. when the font configuration of the system changes.
+
+    ``hits`` and ``misses`` count the lookups. The cache can be shared
+    by several threads (see ``export.render_tiles()``).
+    """
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        # key -> extents, least recently used first
+        self._extents = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._extents)
+
+    def text_extents(self, cr, text, font=None):
+        """
+        Return the extents (x_bearing, y_bearing, width, height,
+        x_advance, y_advance) of ``text``, in the font ``font`` (e.g.
+        'sans 10') or in the current font of ``cr``.
+        """
+        key = _font_key(cr, font)
+        if key is None:
+            # The font can not be identified
+            with self._lock:
+                self.misses += 1
+            return _measure(cr, text, font)
+
+        key += (text,)
+        cache = self._extents
+        with self._lock:
+            extents = cache.pop(key, None)
+            if extents is not None:
+                self.hits += 1
+                # Reinsert, to mark the extents as most recently used
+                cache[key] = extents
+                return extents
+            self.misses += 1
+
+        # Measure outside of the lock, other threads can use the cache
+        extents = _measure(cr, text, font)
+        with self._lock:
+            if key not in cache and len(cache) >= self.max_size:
+                cache.popitem(last=False)
+            cache[key] = extents
+        return extents
+
+    def clear(self):
+        """
+        Remove all extents.
+        """
+        with self._lock:
+            self._extents.clear()
+
+
+text_metrics = TextMetricsCache()
+
+
+def _font_key(cr, font):
+    """
+    Return a key for the font used to measure text on ``cr``, or None if
+    the font can not be identified.
+    """
+    xx, yx, xy, yy, x0, y0 = cr.get_matrix()
+    options = cr.get_font_options().hash()
+    if font:
+        return (font, options, xx, yx, xy, yy)
+    face = cr.get_font_face()
+    try:
+        family = face.get_family()
+    except AttributeError:
+        return None  # not a toy font face
+    return (
+        family,
+        face.get_slant(),
+        face.get_weight(),
+        tuple(cr.get_font_matrix()),
+        options,
+        xx,
+        yx,
+        xy,
+        yy,
+    )
+
+
+def _measure(cr, text, font):
+    if not font:
+        return cr.text_extents(text)
+    cr.save()
+    try:
+        text_set_font(cr, font)
+        return cr.text_extents(text)
+    finally:
+        cr.restore()
+
+
 def text_extents(cr, text, font=None, multiline=False, padding=1):
     """
     Simple way to determine the size of a piece of text.
     """
     if not text:
         return 0, 0
-    if font:
-        cr.save()
-        text_set_font(cr, font)
 
     if multiline:
         width, height = 0, 0
         for line in text.split("\n"):
-            x_bear, y_bear, w, h, x_adv, y_adv = cr.text_extents(line)
+            x_bear, y_bear, w, h, x_adv, y_adv = text_metrics.text_extents(
+                cr, line, font
+            )
             width = max(width, w)
             height += h + padding
     else:
-        x_bear, y_bear, width, height, x_adv, y_adv = cr.text_extents(text)
+        x_bear, y_bear, width, height, x_adv, y_adv = text_metrics.text_extents(
+            cr, text, font
+        )
         # width, height = width + x_bearing, height + y_bearing
 
-    if font:
-        cr.restore()
     return width, height
 
 
@@ -50,7 +161,7 @@ def text_align(cr, x, y, text, align_x=0, align_y=0, padding_x=0, padding_y=0):
     if not text:
         return
 
-    x_bear, y_bear, w, h, x_adv, y_adv = cr.text_extents(text)
+    x_bear, y_bear, w, h, x_adv, y_adv = text_metrics.text_extents(cr, text)
     if align_x == 0:
         x = 0.5 - (w / 2 + x_bear) + x
     elif align_x < 0:
@@ -79,8 +190,8 @@ def text_multiline(cr, x, y, text, padding=1):
     if not text:
         return
     # cr.move_to(x, y)
+    x_bear, y_bear, w, h, x_adv, y_adv = text_metrics.text_extents(cr, text)
     for line in text.split("\n"):
-        x_bear, y_bear, w, h, x_adv, y_adv = cr.text_extents(text)
         y += h
         cr.move_to(x, y)
         cr.show_text(line)
@@ -90,7 +201,7 @@ def text_underline(cr, x, y, text, offset=1.5):
     """
     Draw text with underline.
     """
-    x_bear, y_bear, w, h, x_adv, y_adv = cr.text_extents(text)
+    x_bear, y_bear, w, h, x_adv, y_adv = text_metrics.text_extents(cr, text)
     cr.move_to(x, y - y_bear)
     cr.show_text(text)
     cr.move_to(x, y - y_bear + offset)
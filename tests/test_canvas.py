@@ -32,6 +32,22 @@ def test_reparent():
     c.reparent(b2, None)
 
 
+def test_update_generation():
+    c = Canvas()
+    b = Box()
+    c.add(b)
+    c.update_now()
+    generation = b._update_generation
+
+    c.request_matrix_update(b)
+    c.update_now()
+    assert b._update_generation == generation
+
+    c.request_update(b)
+    c.update_now()
+    assert b._update_generation == generation + 1
+
+
 # fixme: what about multiple constraints for a handle?
 #        what about 1d projection?
 
@@ -0,0 +1,242 @@
+"""Test cases for exporting canvases.
+
+"""
+import subprocess
+import sys
+import threading
+
+import cairo
+import pytest
+
+from gaphas.canvas import Canvas
+from gaphas.examples import Box
+from gaphas.export import (
+    export,
+    export_batch,
+    export_pages,
+    export_tiles,
+    render,
+    render_tiles,
+)
+from gaphas.baseview import OffscreenView
+
+
+def make_canvas():
+    canvas = Canvas()
+    box = Box(40, 20)
+    box.matrix.translate(10, 10)
+    canvas.add(box)
+    return canvas
+
+
+def test_offscreen_view_bounding_box():
+    canvas = make_canvas()
+    view = OffscreenView(canvas)
+
+    box = canvas.get_root_items()[0]
+    assert view.get_item_bounding_box(box)
+    assert view.bounding_box == view.get_item_bounding_box(box)
+
+
+def test_offscreen_view_finds_items():
+    canvas = make_canvas()
+    box = Box(40, 20)
+    box.matrix.translate(1000, 1000)
+    canvas.add(box)
+    view = OffscreenView(canvas)
+
+    assert view.get_item_at_point(view.get_matrix_i2v(box).transform_point(5, 5)) is box
+    assert len(view.get_items_in_rectangle(view.bounding_box)) == 2
+
+
+def test_offscreen_view_zoom():
+    canvas = make_canvas()
+    view = OffscreenView(canvas)
+    x, y, w, h = view.bounding_box
+
+    view.zoom(2)
+
+    assert view.bounding_box.width > w
+
+
+def test_offscreen_view_zoom_scales_index():
+    canvas = make_canvas()
+    box = canvas.get_root_items()[0]
+    view = OffscreenView(canvas)
+    view.scroll(7, 3)
+    x, y, w, h = view.get_item_bounding_box(box)
+
+    view.zoom(1.5)
+
+    i2v = view.get_matrix_i2v(box)
+    assert tuple(i2v) == tuple(canvas.get_matrix_i2c(box).multiply(view.matrix))
+    assert view.get_matrix_v2i(box).transform_point(*i2v.transform_point(5, 5)) == (
+        pytest.approx(5),
+        pytest.approx(5),
+    )
+    assert view.get_item_at_point(i2v.transform_point(5, 5)) is box
+    assert view.get_item_bounding_box(box).width == pytest.approx(w * 1.5)
+
+
+def test_offscreen_view_zoom_updates_items():
+    canvas = make_canvas()
+    box = canvas.get_root_items()[0]
+    view = OffscreenView(canvas)
+
+    view.zoom(3)
+    bounds = view.get_item_bounding_box(box)
+    view.update()
+
+    assert view.get_item_bounding_box(box) == bounds
+
+
+def test_offscreen_view_zoom_before_update():
+    class DeferredView(OffscreenView):
+        def request_update(self, items, matrix_only_items=(), removed_items=()):
+            pass
+
+    canvas = make_canvas()
+    box = canvas.get_root_items()[0]
+    view = DeferredView(canvas)
+    x, y, w, h = view.get_item_bounding_box(box)
+
+    view.zoom(3)
+
+    # The index is consistent, though the items are not updated yet
+    i2v = view.get_matrix_i2v(box)
+    assert view.get_item_at_point(i2v.transform_point(5, 5)) is box
+    assert view.get_item_bounding_box(box)[2] == pytest.approx(w * 3)
+
+
+def test_render_region():
+    view = OffscreenView(make_canvas())
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 20, 20)
+
+    render(view, surface, (10, 10, 20, 20))
+
+    assert surface.get_device_offset() == (0, 0)
+
+
+def test_render_tiles():
+    canvas = make_canvas()
+    box = Box(40, 20)
+    box.matrix.translate(60, 30)
+    canvas.add(box)
+    view = OffscreenView(canvas)
+    x, y, w, h = view.bounding_box
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(w), int(h))
+    tiled = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(w), int(h))
+
+    render(view, surface)
+    render_tiles(view, tiled, tile_size=16, threads=3)
+
+    assert tiled.get_device_offset() == (0, 0)
+    assert bytes(tiled.get_data()) == bytes(surface.get_data())
+
+
+def test_render_tiles_queries_index_before_threads():
+    canvas = make_canvas()
+    for i in range(30):
+        box = Box(10, 10)
+        box.matrix.translate(i * 5, i * 3)
+        canvas.add(box)
+    view = OffscreenView(canvas)
+    qtree = view._qtree
+    threads = set()
+
+    def recorded(find):
+        def find_recorded(*args, **kwargs):
+            threads.add(threading.current_thread())
+            return find(*args, **kwargs)
+
+        return find_recorded
+
+    qtree.find_intersect = recorded(qtree.find_intersect)
+    qtree.find_intersect_many = recorded(qtree.find_intersect_many)
+    x, y, w, h = view.bounding_box
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(w), int(h))
+
+    render_tiles(view, surface, tile_size=16, threads=3)
+
+    assert threads == {threading.current_thread()}
+
+
+def test_export_threads(tmpdir):
+    filename = str(tmpdir.join("canvas.png"))
+
+    export(make_canvas(), filename, scale=8, threads=2)
+
+    assert tmpdir.join("canvas.png").size() > 0
+
+
+@pytest.mark.parametrize("format", ["png", "svg", "pdf"])
+def test_export(tmpdir, format):
+    filename = str(tmpdir.join("canvas." + format))
+
+    assert export(make_canvas(), filename, scale=2, padding=4) == filename
+    assert tmpdir.join("canvas." + format).size() > 0
+
+
+def test_export_unknown_format(tmpdir):
+    with pytest.raises(ValueError):
+        export(make_canvas(), str(tmpdir.join("canvas.bmp")))
+
+
+def test_export_batch(tmpdir):
+    jobs = [(make_canvas, str(tmpdir.join("%d.png" % i))) for i in range(5)]
+    jobs.append((make_canvas(), str(tmpdir.join("5.png"))))
+
+    filenames = export_batch(iter(jobs), processes=2, maxtasksperchild=2)
+
+    assert filenames == [f for c, f in jobs]
+    assert all(tmpdir.join("%d.png" % i).check() for i in range(6))
+
+
+def test_export_pages(tmpdir):
+    canvas = make_canvas()
+    box = Box(40, 20)
+    box.matrix.translate(520, 10)
+    canvas.add(box)
+    filename = str(tmpdir.join("pages.pdf"))
+
+    assert export_pages(canvas, filename, page_size=(100, 100)) == 6
+    assert export_pages(canvas, filename, page_size=(100, 100), skip_empty=True) == 2
+
+
+def test_export_tiles(tmpdir):
+    canvas = make_canvas()
+    box = Box(40, 20)
+    box.matrix.translate(520, 10)
+    canvas.add(box)
+
+    levels = export_tiles(canvas, str(tmpdir), tile_size=64)
+
+    assert levels == 5
+    assert tmpdir.join("0", "0", "0.png").check()
+    assert not tmpdir.join("4", "3", "0.png").check()
+    assert tmpdir.join("4", "7", "0.png").check()
+
+
+def test_export_tiles_are_aligned(tmpdir, monkeypatch):
+    origins = {}
+
+    def render(view, surface, area):
+        scale = view.matrix[0]
+        x, y = origins.get(scale, (area.x, area.y))
+        origins[scale] = min(x, area.x), min(y, area.y)
+
+    monkeypatch.setattr("gaphas.export.render", render)
+    export_tiles(make_canvas(), str(tmpdir), tile_size=16, levels=3, scale=4.0)
+
+    # The top level starts at the bounding box: the box at (10, 10) * 4,
+    # minus the padding of the bounding box
+    assert origins == {1.0: (8.5, 8.5), 2.0: (17.0, 17.0), 4.0: (34.0, 34.0)}
+
+
+def test_export_without_gtk():
+    code = (
+        "import sys; sys.modules['gi'] = None\n"
+        "from gaphas.export import OffscreenView\n"
+        "assert 'gaphas.view' not in sys.modules"
+    )
+    subprocess.check_call([sys.executable, "-c", code])
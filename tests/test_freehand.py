@@ -1,6 +1,9 @@
 import cairo
 
-from gaphas.freehand import FreeHandCairoContext
+from gaphas.canvas import Canvas
+from gaphas.examples import Box
+from gaphas.freehand import FreeHandCairoContext, FreeHandPainter
+from gaphas.painter import Context, Painter, PainterChain
 
 
 def test_drawing_lines():
@@ -24,6 +27,56 @@ def test_drawing_rectangle():
     cr.show_page()
 
 
+def test_curves_are_reused():
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 100, 100)
+    cr = FreeHandCairoContext(cairo.Context(surface))
+    curves = []
+    cr.set_curves(curves)
+    cr.rectangle(20, 20, 60, 60)
+    path = list(cr.copy_path())
+    first = list(curves)
+
+    cr.new_path()
+    cr.translate(10, 10)
+    cr.set_curves(curves)
+    cr.rectangle(20, 20, 60, 60)
+
+    assert len(first) == 4
+    assert curves == first
+    assert list(cr.copy_path()) == path
+
+    cr.new_path()
+    cr.set_curves(curves)
+    cr.rectangle(20, 20, 60, 50)
+
+    assert curves[0] == first[0]
+    assert curves[1] != first[1]
+
+
+class CountingPainter(Painter):
+    def __init__(self):
+        super(CountingPainter, self).__init__()
+        self.contexts = []
+
+    def paint(self, context):
+        self.contexts.append(context)
+
+
+def test_painter_chain_is_painted_once():
+    canvas = Canvas()
+    boxes = [Box(), Box()]
+    for box in boxes:
+        canvas.add(box)
+    counting = CountingPainter()
+    painter = FreeHandPainter(PainterChain().append(counting))
+    cr = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 100, 100))
+
+    painter.paint(Context(cairo=cr, items=boxes, area=None))
+
+    assert len(counting.contexts) == 1
+    assert counting.contexts[0].items == boxes
+
+
 DRAWING_LINES_OUTPUT = """<?xml version="1.0" encoding="UTF-8"?>
 <svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="100pt" height="100pt" viewBox="0 0 100 100" version="1.1">
 <g id="surface0">
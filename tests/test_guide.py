@@ -6,9 +6,9 @@ import pytest
 from gi.repository import Gtk
 
 from gaphas.canvas import Canvas
-from gaphas.guide import Guide, GuidedItemInMotion
+from gaphas.guide import EdgeIndex, Guide, GuidedItemInMotion, _SortedEdges
 from gaphas.item import Element, Line
-from gaphas.view import GtkView
+from gaphas.view import GtkView, View
 
 
 class Window(object):
@@ -96,6 +96,53 @@ def test_line_guide_horizontal(win):
     assert 20.0 == guides[1]
 
 
+def test_edge_index():
+    canvas = Canvas()
+    e1 = Element(20, 10)
+    e2 = Element()
+    e2.matrix.translate(30, 40)
+    canvas.add(e1)
+    canvas.add(e2)
+    canvas.update_now()
+    view = View(canvas)
+
+    index = EdgeIndex()
+    index.update_item(view, e1)
+    index.update_item(view, e2)
+
+    assert list(index.find_vertical(9, 31)) == [(10, e1), (20, e1), (30, e2)]
+    assert list(index.find_horizontal(5, 40)) == [(5, e1), (10, e1), (40, e2)]
+
+    e1.matrix.translate(100, 0)
+    canvas.request_matrix_update(e1)
+    canvas.update_now()
+    index.update_item(view, e1, matrix_only=True)
+    assert list(index.find_vertical(0, 31)) == [(30, e2)]
+
+    index.remove_item(e2)
+    assert list(index.find_horizontal(5, 40)) == [(5, e1), (10, e1)]
+
+
+def test_sorted_edges_over_many_blocks():
+    edges = _SortedEdges()
+    edges.BLOCK_SIZE = 4
+    items = list(range(100))
+    for i in items:
+        edges.add(i % 10, i)
+    assert len(list(edges.find(3, 4))) == 20
+
+    # Sorted in one by one, splitting blocks
+    for i in range(100, 150):
+        edges.add(i % 10, i)
+        assert (i % 10, i) in list(edges.find(i % 10, i % 10))
+    for i in range(0, 150, 3):
+        edges.remove(i % 10, i)
+
+    expected = sorted((i % 10, i) for i in range(150) if i % 3)
+    assert sorted(edges.find(-1, 10)) == expected
+    assert [v for v, i in edges.find(2, 6)] == [v for v, i in expected if 2 <= v <= 6]
+
+
 def test_guide_item_in_motion(win):
     win.canvas.add(win.e1)
     win.canvas.add(win.e2)
@@ -0,0 +1,185 @@
+import pytest
+
+from gaphas.canvas import Canvas
+from gaphas.connector import PointPort, Port
+from gaphas.examples import Box
+from gaphas.geometry import Rectangle
+from gaphas.index import GlueSession, HandlePortIndex
+from gaphas.item import Line
+from gaphas.view import View
+
+
+@pytest.fixture()
+def canvas():
+    canvas = Canvas()
+    box = Box(40, 40)
+    box.matrix.translate(100, 50)
+    canvas.add(box)
+    line = Line()
+    line.handles()[1].pos = (30, 30)
+    line.matrix.translate(10, 10)
+    canvas.add(line)
+    canvas.update_now()
+    return canvas
+
+
+@pytest.fixture()
+def index(canvas):
+    view = View(canvas)
+    index = HandlePortIndex()
+    for item in canvas.get_all_items():
+        index.update_item(view, item)
+    return index
+
+
+def test_find_handles(canvas, index):
+    box, line = canvas.get_all_items()
+    found = index.find_handles((75, 45), k=2)
+    assert [(i, h) for i, h, d in found] == [
+        (box, box.handles()[0]),
+        (line, line.handles()[1]),
+    ]
+    assert found[0][2] == pytest.approx(650 ** 0.5)
+
+
+def test_find_handles_max_distance(canvas, index):
+    assert not index.find_handles((70, 70), max_distance=10)
+
+
+def test_find_handles_accept(canvas, index):
+    box, line = canvas.get_all_items()
+    found = index.find_handles((97, 52), accept=lambda i, h: i is line)
+    assert [(i, h) for i, h, d in found] == [(line, line.handles()[1])]
+
+
+def test_find_ports(canvas, index):
+    box, line = canvas.get_all_items()
+    [(item, port, glue_point, d)] = index.find_ports((95, 60))
+    assert item is box
+    assert port is box.ports()[3]
+    assert glue_point == (100, 60)
+    assert d == 5
+
+
+def test_find_ports_excludes(canvas, index):
+    box, line = canvas.get_all_items()
+    found = index.find_ports((95, 60), accept=lambda i, p: i is not box)
+    assert [i for i, p, g, d in found] == [line]
+
+
+def test_update_moved_item(canvas, index):
+    box, line = canvas.get_all_items()
+    view = View(canvas)
+    box.matrix.translate(100, 0)
+    canvas.request_matrix_update(box)
+    canvas.update_now()
+    index.update_item(view, box, matrix_only=True)
+
+    [(item, port, glue_point, d)] = index.find_ports((195, 60))
+    assert item is box
+    assert glue_point == (200, 60)
+
+
+def test_find_ports_in_rectangle(canvas, index):
+    box, line = canvas.get_all_items()
+    found = index.find_ports_in_rectangle((110, 40, 10, 10))
+    assert [(i, p) for i, p, i2c, c2i, b in found] == [(box, box.ports()[0])]
+    assert found[0][2] == canvas.get_matrix_i2c(box)
+    assert found[0][4] == (100, 50, 40, 0)
+
+
+def test_glue_session(canvas, index):
+    box, line = canvas.get_all_items()
+    session = GlueSession(index, margin=20)
+
+    item, port, glue_point, d = session.find_port((95, 60), 10)
+    assert (item, port, glue_point, d) == (box, box.ports()[3], (100, 60), 5)
+    region = session._region
+
+    # Answered from the same ports
+    assert session.find_port((96, 70), 10)[2] == (100, 70)
+    assert session._region is region
+
+    assert session.find_port((150, 70), 10)[2] == (140, 70)
+    assert session._region is not region
+
+
+def test_glue_session_accept(canvas, index):
+    box, line = canvas.get_all_items()
+    session = GlueSession(index)
+
+    assert session.find_port((95, 60), 10, accept=lambda i, p: i is not box) is None
+    assert session.find_port((95, 60), 10)[0] is box
+
+
+def test_glue_session_skips_distant_ports(canvas):
+    glued = []
+
+    class RecordingPort(PointPort):
+        def glue(self, pos):
+            glued.append(self)
+            return super(RecordingPort, self).glue(pos)
+
+    box, line = canvas.get_all_items()
+    box._ports[:] = [RecordingPort((x, 0)) for x in range(0, 41, 5)]
+    view = View(canvas)
+    index = HandlePortIndex()
+    index.update_item(view, box)
+    session = GlueSession(index)
+
+    item, port, glue_point, d = session.find_port((111, 45), 10)
+    assert port is box.ports()[2]
+    assert glue_point == (110, 50)
+    # The other ports are further away than the port found
+    assert glued == [port]
+
+
+def test_remove_item(canvas, index):
+    box, line = canvas.get_all_items()
+    index.remove_item(box)
+    assert [i for i, h, d in index.find_handles((97, 52))] == [line]
+
+
+def test_grow_with_handles_on_edge():
+    canvas = Canvas()
+    lines = []
+    for pos in [(50, 100), (0, 150), (50, 25), (-100, -50)]:
+        line = Line()
+        line.handles()[1].pos = pos
+        canvas.add(line)
+        lines.append(line)
+    canvas.update_now()
+    view = View(canvas)
+    index = HandlePortIndex()
+
+    # The tree grows, with handles on the edges of its buckets
+    for line in lines:
+        index.update_item(view, line)
+    lines[1].handles()[1].pos = (0, 100)
+    canvas.update_now()
+    index.update_item(view, lines[1])
+
+    found = index.find_handles_in_rectangle((-10, 90, 20, 20))
+    assert found == [(lines[1], lines[1].handles()[1])]
+    for line in lines:
+        index.remove_item(line)
+    assert index.find_handles_in_rectangle((-200, -200, 400, 400)) == []
+
+
+def test_port_without_geometry(canvas):
+    class CornerPort(Port):
+        def glue(self, pos):
+            return (0, 0), 0
+
+    box, line = canvas.get_all_items()
+    port = CornerPort()
+    box._ports.append(port)
+    view = View(canvas)
+    view.set_item_bounding_box(box, Rectangle(100, 50, 40, 40))
+
+    # The port is indexed with the item's bounding box
+    [(item, found, glue_point, d)] = view._handle_port_index.find_ports(
+        (120, 70), accept=lambda i, p: p is port
+    )
+    assert found is port
+    assert glue_point == (100, 50)
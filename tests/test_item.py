@@ -4,6 +4,8 @@ The test check functionality of `Item.constraint` method, not constraints
 themselves.
 
 """
+import pickle
+
 import pytest
 
 from gaphas.constraint import LineConstraint, EqualsConstraint, LessThanConstraint
@@ -89,3 +91,10 @@ def test_above_constraint(item_pos):
     assert isinstance(c, LessThanConstraint)
     assert 2 == c.smaller
     assert 4 == c.bigger
+
+
+def test_update_generation_is_not_pickled():
+    item = Item()
+    item._update_generation = 3
+
+    assert pickle.loads(pickle.dumps(item))._update_generation == 0
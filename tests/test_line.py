@@ -1,6 +1,7 @@
 """Basic item tests for lines.
 
 """
+import pickle
 
 from gaphas.canvas import Canvas
 from gaphas.item import Line
@@ -73,3 +74,66 @@ def test_orthogonal_line_undo(revert_undo, undo_fixture):
     assert not line.orthogonal
     assert 0 == len(canvas.solver._constraints)
     assert 2 == len(line.handles())
+
+
+def test_closest_segment_of_long_line():
+    """Test closest segment of a line with many handles.
+
+    """
+    canvas = Canvas()
+    line = Line()
+    for x in range(2, 100):
+        line._handles.append(line._create_handle((x * 10, (x % 2) * 10)))
+    canvas.add(line)
+    canvas.update_now()
+
+    distance, point, segment = line.closest_segment((505, 5))
+    assert segment == 50
+    assert point == (505, 5)
+    assert distance == 0
+
+    line.handles()[51].pos = (510, 0)
+    line.request_update()
+    canvas.update_now()
+
+    assert line.closest_segment((505, 5)) == (5, (505, 0), 50)
+
+
+def test_closest_segment_after_handle_move():
+    """Test closest segment of a long line, after moving a handle.
+
+    The line is not updated in between.
+
+    """
+    canvas = Canvas()
+    line = Line()
+    for x in range(2, 100):
+        line._handles.append(line._create_handle((x * 10, (x % 2) * 10)))
+    canvas.add(line)
+    canvas.update_now()
+
+    assert line.closest_segment((505, 5)) == (0, (505, 5), 50)
+
+    line.handles()[51].pos = (510, 0)
+
+    assert line.closest_segment((505, 5)) == (5, (505, 0), 50)
+
+
+def test_packed_handle_positions_are_reused():
+    line = Line()
+    line._handles.append(line._create_handle((20, 0)))
+    packed = line._packed_handle_positions()
+
+    assert line._packed_handle_positions() is packed
+
+    del line._handles[1]
+
+    assert line.closest_segment((10, 0)) == (0, (10, 0), 0)
+    assert line._packed_handle_positions() is not packed
+
+
+def test_packed_handle_positions_are_not_pickled():
+    line = Line()
+    line.closest_segment((5, 5))
+
+    assert pickle.loads(pickle.dumps(line))._packed_handles is None
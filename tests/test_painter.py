@@ -0,0 +1,172 @@
+"""Test cases for the painters.
+
+"""
+import cairo
+import pytest
+
+from gaphas.canvas import Canvas, Context
+from gaphas.examples import Box
+from gaphas.freehand import FreeHandPainter
+from gaphas.painter import BoundingBoxPainter, DrawContext, ItemPainter
+from gaphas.painter import LevelOfDetail
+from gaphas.view import View
+
+
+class CountingBox(Box):
+    draws = 0
+    simplified_draws = 0
+    context = None
+    area = None
+
+    def draw(self, context):
+        self.draws += 1
+        self.context = context
+        self.area = context._area
+        super(CountingBox, self).draw(context)
+
+    def draw_simplified(self, context):
+        self.simplified_draws += 1
+        super(CountingBox, self).draw_simplified(context)
+
+
+@pytest.fixture()
+def painter():
+    canvas = Canvas()
+    canvas.add(CountingBox())
+    canvas.update_now()
+    return ItemPainter(View(canvas), cache=True)
+
+
+def paint(painter):
+    view = painter.view
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 100, 100)
+    painter.paint(
+        Context(
+            cairo=cairo.Context(surface),
+            items=view.canvas.get_all_items(),
+            area=(0, 0, 100, 100),
+        )
+    )
+
+
+def test_recording_is_replayed(painter):
+    box = painter.view.canvas.get_root_items()[0]
+    paint(painter)
+    box.matrix.translate(10, 10)
+    painter.view.canvas.request_matrix_update(box)
+    painter.view.canvas.update_now()
+    paint(painter)
+
+    assert box.draws == 1
+
+
+def test_recording_is_not_culled(painter):
+    box = painter.view.canvas.get_root_items()[0]
+    paint(painter)
+
+    assert box.draws == 1
+    assert box.area is None
+
+
+def test_recording_invalidated_by_update(painter):
+    box = painter.view.canvas.get_root_items()[0]
+    paint(painter)
+    painter.view.canvas.request_update(box)
+    painter.view.canvas.update_now()
+    paint(painter)
+
+    assert box.draws == 2
+
+
+def test_recording_invalidated_by_hover(painter):
+    box = painter.view.canvas.get_root_items()[0]
+    paint(painter)
+    painter.view.hovered_item = box
+    paint(painter)
+
+    assert box.draws == 2
+
+
+def test_level_of_detail(painter):
+    view = painter.view
+    box = view.canvas.get_root_items()[0]
+    view.level_of_detail = LevelOfDetail(simplified=100, proxy=20)
+    paint(painter)
+
+    assert (box.draws, box.simplified_draws) == (0, 1)
+
+    view.matrix.scale(4, 4)
+    view.update_matrix(box)
+    paint(painter)
+
+    assert (box.draws, box.simplified_draws) == (1, 1)
+
+
+def update_bounding_box(view):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 0, 0)
+    view.update_bounding_box(cairo.Context(surface))
+
+
+def test_bounding_box_from_bounds(painter):
+    view = painter.view
+    box = view.canvas.get_root_items()[0]
+    update_bounding_box(view)
+
+    assert box.draws == 0
+    assert tuple(view.get_item_bounding_box(box)) == (-6, -6, 21, 21)
+
+
+def test_bounding_box_drawn_through_wrapper(painter):
+    view = painter.view
+    box = view.canvas.get_root_items()[0]
+    view.bounding_box_painter = FreeHandPainter(BoundingBoxPainter())
+    update_bounding_box(view)
+
+    assert box.draws == 1
+
+
+def test_bounding_box_drawn_once(painter):
+    view = painter.view
+    box = view.canvas.get_root_items()[0]
+    box.bounds_from_handles = False
+    update_bounding_box(view)
+    bounds = view.get_item_bounding_box(box)
+    update_bounding_box(view)
+
+    assert box.draws == 1
+    assert view.get_item_bounding_box(box) == bounds
+
+    view.canvas.request_update(box)
+    view.canvas.update_now()
+    update_bounding_box(view)
+
+    assert box.draws == 2
+
+
+def test_draw_context_is_reused():
+    canvas = Canvas()
+    box1, box2 = CountingBox(), CountingBox()
+    canvas.add(box1)
+    canvas.add(box2)
+    canvas.update_now()
+    view = View(canvas)
+    view.hovered_item = box2
+    painter = ItemPainter(view)
+
+    paint(painter)
+
+    assert box1.context is box2.context
+    assert box2.context._item is box2
+    assert box2.context.hovered
+    with pytest.raises(AttributeError):
+        box2.context.hovered = False
+
+
+def test_draw_context_accepts_extra_arguments():
+    context = DrawContext(cairo=None, selected=True, extra="extra")
+
+    assert isinstance(context, Context)
+    assert context.selected
+    assert context.extra == "extra"
+    with pytest.raises(AttributeError):
+        context.extra = None
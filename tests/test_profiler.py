@@ -0,0 +1,75 @@
+"""Test cases for the painter profiler.
+
+"""
+import cairo
+import pytest
+
+from gaphas.canvas import Canvas, Context
+from gaphas.examples import Box
+from gaphas.item import Line
+from gaphas.painter import HandlePainter, ItemPainter, PainterChain, TilePainter
+from gaphas.profiler import PainterProfiler
+from gaphas.view import View
+
+
+@pytest.fixture()
+def view():
+    canvas = Canvas()
+    canvas.add(Box())
+    canvas.add(Box())
+    canvas.add(Line())
+    canvas.update_now()
+    view = View(canvas)
+    view.painter = (
+        PainterChain(view).append(TilePainter(ItemPainter())).append(HandlePainter())
+    )
+    return view
+
+
+def paint(view):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 100, 100)
+    view.painter.paint(
+        Context(
+            cairo=cairo.Context(surface),
+            items=view.canvas.get_all_items(),
+            area=(0, 0, 100, 100),
+        )
+    )
+
+
+def test_report(view):
+    profiler = PainterProfiler(view.painter)
+    profiler.start()
+    paint(view)
+    paint(view)
+    report = profiler.report()
+
+    assert report.frames == 2
+    assert [p for p, t in report.painters] == ["TilePainter", "HandlePainter"]
+    assert sorted((cls.__name__, n) for cls, n, t in report.items) == [
+        ("Box", 4),
+        ("Line", 2),
+    ]
+    assert report.total >= sum(t for p, t in report.painters)
+
+
+def test_callback(view):
+    reports = []
+    profiler = PainterProfiler(view.painter, frames=2, callback=reports.append)
+    profiler.start()
+    for i in range(5):
+        paint(view)
+
+    assert [r.frames for r in reports] == [2, 2]
+    assert profiler.report().frames == 1
+
+
+def test_stop_restores_painters(view):
+    profiler = PainterProfiler(view.painter)
+    profiler.start()
+    profiler.stop()
+    paint(view)
+
+    assert not profiler.running
+    assert profiler.report().frames == 0
+    assert "paint" not in view.painter.__dict__
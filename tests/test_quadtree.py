@@ -36,6 +36,8 @@ def test_with_rectangles(qtree):
 def test_moving_items(qtree):
     qtree.capacity = 10
     assert len(qtree._ids) == 100, len(qtree._ids)
+    # Buckets are split on query
+    assert len(qtree.find_intersect((0, 0, 100, 100))) == 100
     assert qtree._bucket._buckets, qtree._bucket._buckets
     for i in range(4):
         assert qtree._bucket._buckets[i]._buckets
@@ -89,3 +91,159 @@ def test_clipped_bounds(qtree):
     qtree.capacity = 10
     qtree.add(item=1, bounds=(-100, -100, 120, 120))
     assert (0, 0, 20, 20) == qtree.get_clipped_bounds(item=1)
+
+
+def test_find_intersect_many(qtree):
+    rects = [(5, 5, 20, 20), (41, 41, 1, 1), (200, 200, 10, 10), (0, 0, 100, 100)]
+    found = qtree.find_intersect_many(rects)
+    assert len(found) == len(rects)
+    for rect, items in zip(rects, found):
+        assert items == qtree.find_intersect(rect)
+
+
+def test_find_inside_many(qtree):
+    rects = [(5, 5, 20, 20), (0, 0, 50, 50), (0, 0, 100, 100)]
+    found = qtree.find_inside_many(rects)
+    for rect, items in zip(rects, found):
+        assert items == qtree.find_inside(rect)
+
+
+def test_find_many_without_numpy(qtree, monkeypatch):
+    from gaphas import quadtree
+
+    rects = [(5, 5, 20, 20), (0, 0, 50, 50), (0, 0, 100, 100)]
+    expected = qtree.find_intersect_many(rects)
+    monkeypatch.setattr(quadtree, "numpy", None)
+    assert qtree.find_intersect_many(rects) == expected
+
+
+def test_split_on_query():
+    qtree = Quadtree((0, 0, 100, 100), capacity=4)
+    for i in range(10):
+        qtree.add(i, (i * 10, i * 10, 5, 5))
+    assert not qtree._bucket._buckets
+    assert len(qtree._bucket.items) == 10
+
+    assert qtree.find_intersect((0, 0, 10, 10)) == {0, 1}
+    assert qtree._bucket._buckets
+    assert qtree._bucket.count == 10
+
+
+def test_merge_on_remove():
+    qtree = Quadtree((0, 0, 100, 100), capacity=4)
+    for i in range(10):
+        qtree.add(i, (i * 10, i * 10, 5, 5))
+    qtree.find_intersect((0, 0, 100, 100))
+    assert qtree._bucket._buckets
+
+    for i in range(8):
+        qtree.remove(i)
+    assert not qtree._bucket._buckets
+    assert sorted(qtree._bucket.items) == [8, 9]
+    assert qtree.find_intersect((0, 0, 100, 100)) == {8, 9}
+
+
+def test_resize_keeps_structure(qtree):
+    qtree.find_intersect((0, 0, 100, 100))
+    bucket = qtree._bucket
+
+    qtree.resize((0, 0, 400, 400))
+    assert qtree.bounds == (0, 0, 400, 400)
+    assert qtree._bucket._buckets[0]._buckets[0] is bucket
+    assert qtree.find_intersect((0, 0, 100, 100)) == set(qtree._ids)
+
+    qtree.resize((0, 0, 100, 100))
+    assert qtree._bucket is bucket
+    assert qtree._bucket.parent is None
+
+
+def test_resize_grows_to_negative_coordinates(qtree):
+    qtree.add("out", (-50, -50, 10, 10))
+    assert qtree.get_clipped_bounds("out") is None
+
+    qtree.resize((-100, -100, 200, 200))
+    assert qtree.get_clipped_bounds("out") == (-50, -50, 10, 10)
+    assert qtree.find_intersect((-60, -60, 20, 20)) == {"out"}
+
+
+def test_resize_matches_rebuild():
+    import random
+
+    rnd = random.Random(4)
+    qtree = Quadtree((0, 0, 100, 100), capacity=4)
+    for i in range(200):
+        qtree.add(i, (rnd.uniform(-50, 250), rnd.uniform(-50, 250), 10, 10))
+
+    for bounds in [(0, 0, 300, 300), (20, 20, 50, 80), (-40, 0, 100, 250)]:
+        qtree.resize(bounds)
+        expected = Quadtree(bounds, capacity=4)
+        for item in qtree._ids:
+            expected.add(item, qtree.get_bounds(item))
+        for item in qtree._ids:
+            assert qtree.get_clipped_bounds(item) == expected.get_clipped_bounds(item)
+        for rect in [bounds, (0, 0, 30, 30), (50, 10, 100, 20)]:
+            assert qtree.find_intersect(rect) == expected.find_intersect(rect)
+            assert qtree.find_inside(rect) == expected.find_inside(rect)
+
+
+@pytest.mark.parametrize(
+    "edge_bounds,bounds",
+    [
+        ((100, 10, 20, 20), (0, 0, 200, 100)),
+        ((10, 100, 20, 20), (0, 0, 100, 200)),
+        ((100, 100, 20, 20), (0, 0, 200, 200)),
+    ],
+)
+def test_resize_with_zero_size_items_on_edge(edge_bounds, bounds):
+    qtree = Quadtree((0, 0, 100, 100))
+    qtree.add("edge", edge_bounds)
+    qtree.add("a", (10, 10, 5, 5))
+
+    qtree.resize(bounds)
+    assert qtree.get_clipped_bounds("edge") == edge_bounds
+    assert qtree.find_intersect(edge_bounds) == {"edge"}
+
+    qtree.add("edge", edge_bounds)
+    qtree.remove("edge")
+    assert qtree.find_intersect(bounds) == {"a"}
+
+
+def test_move_zero_size_item_to_edge():
+    qtree = Quadtree((0, 0, 100, 100), capacity=2)
+    for i in range(4):
+        qtree.add(i, (60 + i, 60, 5, 5))
+    qtree.add("edge", (40, 60, 0, 10))
+    qtree.find_intersect((0, 0, 100, 100))
+
+    # Covered by the bucket on the left, but found on the right
+    qtree.add("edge", (50, 60, 0, 10))
+    assert qtree.find_intersect((45, 55, 10, 10)) == {"edge"}
+    qtree.remove("edge")
+    assert "edge" not in qtree
+
+
+def test_clipped_bounds_with_rounding_error():
+    qtree = Quadtree((-30, -20, 223.1180245470168, 35.64429734487108))
+    bounds = (
+        159.2742033979771,
+        -19.097252651032715,
+        33.84382114903971,
+        34.741549995903796,
+    )
+
+    qtree.add("item", bounds)
+    assert qtree.find_intersect((150, -20, 10, 10)) == {"item"}
+    qtree.remove("item")
+
+
+def test_stats(qtree):
+    stats = qtree.get_stats()
+    assert stats.items == 100
+    assert stats.buckets == 1
+
+    qtree.find_intersect((0, 0, 100, 100))
+    stats = qtree.get_stats()
+    assert stats.buckets == 21
+    assert stats.depth == 3
+    assert stats.max_bucket_items == 9
+    assert stats.memory > 0
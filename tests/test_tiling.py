@@ -0,0 +1,167 @@
+"""Test cases for the tile cache.
+
+"""
+import cairo
+import pytest
+
+from gaphas.canvas import Canvas, Context
+from gaphas.examples import Box
+from gaphas.item import Line
+from gaphas.painter import ItemPainter, TilePainter
+from gaphas.tiling import HitTestCache, TileCache
+from gaphas.view import OffscreenView
+
+
+def test_tiles():
+    cache = TileCache(tile_size=100)
+    assert list(cache.tiles((0, 0, 100, 100))) == [(0, 0)]
+    assert list(cache.tiles((-1, 0, 2, 1))) == [(-1, 0), (0, 0)]
+    assert list(cache.tiles((150, 250, 100, 0))) == [(1, 2), (2, 2)]
+
+
+def test_lru_eviction():
+    cache = TileCache(tile_size=100, max_bytes=3000)
+    level = cairo.Matrix()
+    for tx in range(3):
+        cache.put(level, tx, 0, tx, nbytes=1000)
+
+    cache.get(level, 0, 0)
+    cache.put(level, 3, 0, 3, nbytes=1000)
+
+    assert len(cache) == 3
+    assert cache.nbytes == 3000
+    assert cache.get(level, 1, 0) is None
+    assert cache.get(level, 0, 0) == 0
+
+
+def test_invalidate_all_levels():
+    cache = TileCache(tile_size=100)
+    level1 = cairo.Matrix()
+    level2 = cairo.Matrix(2, 0, 0, 2, 0, 0)
+    for tx in range(4):
+        cache.put(level1, tx, 0, "level1", nbytes=1)
+        cache.put(level2, tx, 0, "level2", nbytes=1)
+
+    cache.invalidate((110, 10, 20, 20))
+
+    assert [tx for tx in range(4) if cache.get(level1, tx, 0)] == [0, 2, 3]
+    assert [tx for tx in range(4) if cache.get(level2, tx, 0)] == [0, 1, 3]
+    assert cache.nbytes == 6
+
+
+def test_clear():
+    cache = TileCache()
+    cache.put(cairo.Matrix(), 0, 0, "tile", nbytes=100)
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+    assert cache.get(cairo.Matrix(), 0, 0) is None
+
+
+@pytest.fixture()
+def tiled_view(simple_canvas):
+    view = simple_canvas.view
+    view.tile_cache = TileCache(tile_size=64)
+    return view
+
+
+def paint(view, area):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 300, 300)
+    cr = cairo.Context(surface)
+    view.painter.paint(
+        Context(cairo=cr, items=view.get_items_in_rectangle(area), area=area)
+    )
+
+
+def test_paint_renders_tiles(tiled_view):
+    paint(tiled_view, (0, 0, 256, 256))
+
+    assert len(tiled_view.tile_cache) == 16
+
+
+def test_hover_invalidates_tiles(simple_canvas, tiled_view):
+    paint(tiled_view, (0, 0, 256, 256))
+
+    tiled_view.hovered_item = simple_canvas.box1
+
+    # box1 is at (100, 50, 40, 40), tile size is 64
+    assert len(tiled_view.tile_cache) == 16 - 4
+
+
+def test_tiled_paint_matches_direct_paint():
+    canvas = Canvas()
+    box = Box(40, 20)
+    box.matrix.translate(60, 30)
+    canvas.add(box)
+    view = OffscreenView(canvas)
+    view.tile_cache = TileCache(tile_size=32)
+    area = (0, 0, 128, 64)
+
+    surfaces = []
+    for painter in (ItemPainter(view), TilePainter(ItemPainter(view), view)):
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 128, 64)
+        painter.paint(
+            Context(
+                cairo=cairo.Context(surface),
+                items=view.get_items_in_rectangle(area),
+                area=area,
+            )
+        )
+        surface.flush()
+        surfaces.append(bytes(surface.get_data()))
+
+    assert len(view.tile_cache) == 8
+    assert surfaces[0] == surfaces[1]
+
+
+@pytest.fixture()
+def hit_test_view():
+    canvas = Canvas()
+    canvas.box1 = Box(40, 40)
+    canvas.add(canvas.box1)
+    canvas.box2 = Box(40, 40)
+    canvas.box2.matrix.translate(20, 20)
+    canvas.add(canvas.box2)
+    view = OffscreenView(canvas)
+    view.hit_test_cache = HitTestCache(tile_size=64)
+    return view
+
+
+def test_hit_test_topmost_item(hit_test_view):
+    canvas = hit_test_view.canvas
+
+    assert hit_test_view.get_item_at_point((10, 10)) is canvas.box1
+    assert hit_test_view.get_item_at_point((30, 30)) is canvas.box2
+    assert hit_test_view.get_item_at_point((100, 10)) is None
+
+
+def test_hit_test_after_update(hit_test_view):
+    canvas = hit_test_view.canvas
+    assert hit_test_view.get_item_at_point((10, 10)) is canvas.box1
+
+    canvas.box1.matrix.translate(100, 0)
+    canvas.request_matrix_update(canvas.box1)
+    hit_test_view.update()
+
+    assert hit_test_view.get_item_at_point((10, 10)) is None
+    assert hit_test_view.get_item_at_point((110, 10)) is canvas.box1
+
+
+def test_hit_test_skips_selected_item(hit_test_view):
+    canvas = hit_test_view.canvas
+    hit_test_view.selected_items = canvas.box2
+
+    assert hit_test_view.get_item_at_point((30, 30), selected=False) is canvas.box1
+
+
+def test_hit_test_fuzzy_line(hit_test_view):
+    canvas = hit_test_view.canvas
+    line = Line()
+    line.fuzziness = 4
+    line.handles()[1].pos = (100, 100)
+    canvas.add(line)
+    hit_test_view.update()
+
+    assert not line.pixel_hit_test
+    assert hit_test_view.get_item_at_point((82, 80)) is line
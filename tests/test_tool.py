@@ -1,9 +1,12 @@
 """Test all the tools.
 
 """
+from gaphas.aspect import InMotion
 from gaphas.canvas import Context
 from gaphas.constraint import LineConstraint
-from gaphas.tool import ConnectHandleTool
+from gaphas.guide import GuidedItemInMotion
+from gaphas.tool import ConnectHandleTool, ItemTool, Tool, ToolChain
+from gi.repository import Gdk
 
 Event = Context
 
@@ -165,3 +168,98 @@ def xtest_find_port(simple_canvas):
     head.pos = 100, 55
     port = simple_canvas.tool.find_port(line, head, simple_canvas.box1)
     assert p4 == port
+
+
+class RecordingTool(Tool):
+    def __init__(self):
+        super(RecordingTool, self).__init__()
+        self.events = []
+
+    def handle(self, event):
+        self.events.append(event)
+        return True
+
+
+class TickView(object):
+    def __init__(self):
+        self.ticks = []
+
+    def get_realized(self):
+        return True
+
+    def add_tick_callback(self, callback):
+        self.ticks.append(callback)
+        return len(self.ticks)
+
+    def remove_tick_callback(self, tick_id):
+        self.ticks[tick_id - 1] = None
+
+    def tick(self):
+        ticks, self.ticks = self.ticks, []
+        for callback in ticks:
+            if callback:
+                callback(self, None)
+
+
+def test_motion_is_coalesced():
+    view = TickView()
+    tool = RecordingTool()
+    chain = ToolChain(view).append(tool)
+    chain.grab(tool)
+
+    motions = [Event(type=Gdk.EventType.MOTION_NOTIFY, x=x, y=0) for x in range(3)]
+    for event in motions:
+        assert chain.handle(event)
+    assert tool.events == []
+
+    view.tick()
+    assert tool.events == [motions[-1]]
+
+
+def test_pending_motion_is_flushed_before_other_events():
+    view = TickView()
+    tool = RecordingTool()
+    chain = ToolChain(view).append(tool)
+    chain.grab(tool)
+
+    motion = Event(type=Gdk.EventType.MOTION_NOTIFY, x=1, y=0)
+    release = Event(type=Gdk.EventType.BUTTON_RELEASE, x=1, y=0)
+    chain.handle(motion)
+    chain.handle(release)
+    assert tool.events == [motion, release]
+
+    view.tick()
+    assert tool.events == [motion, release]
+
+
+def test_drag_selected_items(simple_canvas, revert_undo, undo_fixture):
+    canvas, view = simple_canvas.canvas, simple_canvas.view
+    box1, box2 = simple_canvas.box1, simple_canvas.box2
+    view.select_items((box1, box2))
+    view.focused_item = view.hovered_item = box1
+    assert isinstance(InMotion(box1, view), GuidedItemInMotion)
+    tool = ItemTool(view)
+    del undo_fixture[2][:]  # Clear undo_list
+
+    press = Event(get_button=lambda: (True, 1), get_state=lambda: (True, 0))
+    release = Event(get_button=lambda: (True, 1))
+    tool.on_button_press(press)
+    for x, y in ((110, 60), (130, 75)):
+        motion = Event(
+            get_coords=lambda x=x, y=y: (True, x, y),
+            get_state=lambda: (True, Gdk.EventMask.BUTTON_PRESS_MASK),
+        )
+        tool.on_motion_notify(motion)
+    tool.on_button_release(release)
+    canvas.update_now()
+
+    # Both items are moved in one step
+    assert 1 == len(undo_fixture[2])
+    assert (120, 65) == canvas.get_matrix_i2c(box1).transform_point(0, 0)
+    assert (120, 165) == canvas.get_matrix_i2c(box2).transform_point(0, 0)
+
+    undo_fixture[0]()  # Call undo
+    canvas.update_now()
+
+    assert (100, 50) == canvas.get_matrix_i2c(box1).transform_point(0, 0)
+    assert (100, 150) == canvas.get_matrix_i2c(box2).transform_point(0, 0)
@@ -56,3 +56,28 @@ def test_undo_on_delete_element(revert_undo, undo_fixture):
 
     cinfo = canvas.get_connection(line.handles()[-1])
     assert b2 == cinfo.connected
+
+
+def test_undo_move_items(revert_undo, undo_fixture):
+    canvas = Canvas()
+    b1 = Box()
+    b2 = Box()
+    canvas.add(b1)
+    canvas.add(b2)
+    b2.matrix.translate(10, 10)
+    canvas.update_now()
+
+    del undo_fixture[2][:]  # Clear undo_list
+
+    canvas.move_items((b1, b2), 5, 5)
+    canvas.update_now()
+
+    assert 1 == len(undo_fixture[2])
+    assert (5, 5) == canvas.get_matrix_i2c(b1).transform_point(0, 0)
+    assert (15, 15) == canvas.get_matrix_i2c(b2).transform_point(0, 0)
+
+    undo_fixture[0]()  # Call undo
+    canvas.update_now()
+
+    assert (0, 0) == canvas.get_matrix_i2c(b1).transform_point(0, 0)
+    assert (10, 10) == canvas.get_matrix_i2c(b2).transform_point(0, 0)
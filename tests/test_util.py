@@ -0,0 +1,94 @@
+"""Test cases for the cairo helpers.
+
+"""
+from multiprocessing.pool import ThreadPool
+
+import cairo
+import pytest
+
+from gaphas.util import TextMetricsCache, text_extents, text_metrics
+
+
+@pytest.fixture()
+def cr():
+    return cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 10, 10))
+
+
+def test_extents_are_cached(cr):
+    cache = TextMetricsCache()
+    extents = cache.text_extents(cr, "Hello")
+
+    assert tuple(cache.text_extents(cr, "Hello")) == tuple(extents)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_font_is_part_of_key(cr):
+    cache = TextMetricsCache()
+    small = cache.text_extents(cr, "Hello", "sans 10")
+    large = cache.text_extents(cr, "Hello", "sans 20")
+    cr.set_font_size(20)
+    current = cache.text_extents(cr, "Hello")
+
+    assert large[2] > small[2]
+    assert tuple(current) == tuple(large)
+    assert (cache.hits, cache.misses) == (0, 3)
+
+
+def test_scale_is_part_of_key(cr):
+    cache = TextMetricsCache()
+    cache.text_extents(cr, "Hello")
+    cr.scale(2, 2)
+    cache.text_extents(cr, "Hello")
+
+    assert cache.misses == 2
+
+
+def test_least_recently_used_is_evicted(cr):
+    cache = TextMetricsCache(max_size=2)
+    cache.text_extents(cr, "a")
+    cache.text_extents(cr, "b")
+    cache.text_extents(cr, "a")
+    cache.text_extents(cr, "c")
+    cache.text_extents(cr, "a")
+    cache.text_extents(cr, "b")
+
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_clear(cr):
+    cache = TextMetricsCache()
+    cache.text_extents(cr, "Hello")
+    cache.clear()
+    cache.text_extents(cr, "Hello")
+
+    assert len(cache) == 1
+    assert cache.misses == 2
+
+
+def test_shared_by_threads():
+    cache = TextMetricsCache(max_size=10)
+    texts = [str(i) for i in range(20)] * 10
+
+    def measure(_):
+        cr = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 10, 10))
+        for text in texts:
+            cache.text_extents(cr, text)
+
+    pool = ThreadPool(4)
+    pool.map(measure, range(4))
+    pool.close()
+    pool.join()
+
+    assert len(cache) == 10
+    assert cache.hits + cache.misses == 4 * len(texts)
+
+
+def test_text_extents_multiline(cr):
+    hits = text_metrics.hits
+    width, height = text_extents(cr, "Hello\nHello", multiline=True)
+
+    assert text_metrics.hits > hits
+    assert (width, height) == pytest.approx(
+        (text_extents(cr, "Hello")[0], 2 * text_extents(cr, "Hello")[1] + 2)
+    )
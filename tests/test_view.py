@@ -134,6 +134,94 @@ def test_get_handle_at_point_at_pi_div_2(view_fixture):
     assert h is box.handles()[0]
 
 
+def test_get_handle_at_point_prefers_topmost_item(view_fixture):
+    below, above = Box(), Box()
+    below.matrix.translate(101, 101)
+    above.matrix.translate(105, 105)
+    view_fixture.canvas.add(below)
+    view_fixture.canvas.add(above)
+
+    # Both handles are within the square, the closest one is below
+    i, h = view_fixture.view.get_handle_at_point((100, 100))
+    assert i is above
+    assert h is above.handles()[0]
+
+
+def test_get_port_at_point(view_fixture):
+    box = Box(20, 20)
+    box.matrix.translate(40, 40)
+    view_fixture.canvas.add(box)
+
+    item, port, glue_pos = view_fixture.view.get_port_at_point((35, 50))
+    assert item is box
+    assert port is box.ports()[3]
+    assert glue_pos == (40, 50)
+
+    item, port, glue_pos = view_fixture.view.get_port_at_point(
+        (35, 50), exclude=(box,)
+    )
+    assert item is None
+    assert port is None
+
+
+def test_scroll(view_fixture, monkeypatch):
+    view = view_fixture.view
+    box = view_fixture.box
+    x, y, w, h = view.get_item_bounding_box(box)
+    xx, yx, xy, yy, x0, y0 = view.get_matrix_i2v(box)
+
+    # Scrolling does not update items
+    monkeypatch.setattr(view, "update_matrix", lambda item: pytest.fail())
+    view.scroll(30, 40)
+
+    assert tuple(view.get_item_bounding_box(box)) == (x + 30, y + 40, w, h)
+    assert tuple(view.get_matrix_i2v(box)) == (xx, yx, xy, yy, x0 + 30, y0 + 40)
+    assert view.get_matrix_v2i(box).transform_point(35, 45) == (5, 5)
+    assert view.get_item_at_point((35, 45)) is box
+    assert view.get_item_at_point((5, 5)) is None
+    assert view.get_items_in_rectangle((30, 40, 10, 10)) == [box]
+
+    view_fixture.window.destroy()
+
+
+def test_queue_draw_item_merges_areas(view_fixture, monkeypatch):
+    view = view_fixture.view
+    box = view_fixture.box
+    box2 = Box()
+    box2.matrix.translate(200, 200)
+    view_fixture.canvas.add(box2)
+    box3 = Box()
+    box3.matrix.translate(202, 202)
+    view_fixture.canvas.add(box3)
+
+    areas = []
+    monkeypatch.setattr(view, "queue_draw_area", lambda *a: areas.append(a))
+    view.queue_draw_item(box, box2, box3)
+
+    b = view.get_item_bounding_box(box)
+    b2 = view.get_item_bounding_box(box2) + view.get_item_bounding_box(box3)
+    assert areas == [tuple(b), tuple(b2)]
+
+    view_fixture.window.destroy()
+
+
+def test_select_items_emits_once(view_fixture):
+    view = view_fixture.view
+    box = view_fixture.box
+    box2 = Box()
+    view_fixture.canvas.add(box2)
+
+    changes = []
+    view.connect("selection-changed", lambda v, items: changes.append(set(items)))
+    view.select_all()
+    view.select_items([box, box2])
+    view.unselect_items([box, box2])
+
+    assert changes == [{box, box2}, set()]
+
+    view_fixture.window.destroy()
+
+
 def test_item_removal(view_fixture):
     assert len(view_fixture.canvas.get_all_items()) == len(view_fixture.view._qtree)
 
@@ -158,8 +246,7 @@ def test_view_registration(view_fixture):
     canvas.add(box)
 
     # By default no complex updating/calculations are done:
-    assert view not in box._matrix_i2v
-    assert view not in box._matrix_v2i
+    assert box not in view._item_matrices
 
     # GTK view does register for updates though
 
@@ -167,39 +254,50 @@ def test_view_registration(view_fixture):
     assert len(canvas._registered_views) == 1
 
     # No entry, since GtkView is not realized and has no window
-    assert view not in box._matrix_i2v
-    assert view not in box._matrix_v2i
+    assert box not in view._item_matrices
 
     window = Gtk.Window.new(Gtk.WindowType.TOPLEVEL)
     window.add(view)
     window.show_all()
 
     # Now everything is realized and updated
-    assert view in box._matrix_i2v
-    assert view in box._matrix_v2i
+    assert box in view._item_matrices
 
     view.canvas = None
     assert len(canvas._registered_views) == 0
 
-    assert view not in box._matrix_i2v
-    assert view not in box._matrix_v2i
+    assert box not in view._item_matrices
 
     view.canvas = canvas
     assert len(canvas._registered_views) == 1
 
-    assert view in box._matrix_i2v
-    assert view in box._matrix_v2i
+    assert box in view._item_matrices
+
+
+def test_removed_items_are_released():
+    canvas = Canvas()
+    view = View(canvas)
+    canvas.register_view(view)
+    box = Box()
+    canvas.add(box)
+    view.focused_item = box
+
+    i2v = view.get_matrix_i2v(box)
+    assert view.get_matrix_i2v(box) is i2v
+    assert box in view._item_matrices
+
+    canvas.remove(box)
+    canvas.update_now()
+
+    assert box not in view._item_matrices
+    assert view.focused_item is None
 
 
 def test_view_registration_2(view_fixture):
     """Test view registration and destroy when view is destroyed.
 
     """
-    assert hasattr(view_fixture.box, "_matrix_i2v")
-    assert hasattr(view_fixture.box, "_matrix_v2i")
-
-    assert view_fixture.box._matrix_i2v[view_fixture.view]
-    assert view_fixture.box._matrix_v2i[view_fixture.view]
+    assert view_fixture.box in view_fixture.view._item_matrices
 
     assert len(view_fixture.canvas._registered_views) == 1
     assert view_fixture.view in view_fixture.canvas._registered_views
@@ -208,8 +306,7 @@ def test_view_registration_2(view_fixture):
 
     assert len(view_fixture.canvas._registered_views) == 0
 
-    assert view_fixture.view not in view_fixture.box._matrix_i2v
-    assert view_fixture.view not in view_fixture.box._matrix_v2i
+    assert view_fixture.box not in view_fixture.view._item_matrices
 
 
 @pytest.fixture()